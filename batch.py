@@ -0,0 +1,103 @@
+import os
+import tarfile
+import uuid
+import zipfile
+
+from uploads import copy_stream, UploadTooLarge, MAX_UPLOAD_BYTES
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "1000"))
+
+## Request body limit for /analyze/batch (every file at the per-file limit)
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(BATCH_MAX_FILES * MAX_UPLOAD_BYTES)))
+
+## Batch jobs submitted at once; leaves queue room for interactive /analyze calls
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", os.getenv("JOB_WORKERS", "4")))
+
+## Seconds to wait before retrying when the job queue is full
+BATCH_RETRY_INTERVAL = float(os.getenv("BATCH_RETRY_INTERVAL", "0.5"))
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+class TooManyFiles(Exception):
+    """Raised when a batch expands to more than BATCH_MAX_FILES documents."""
+
+
+class ArchiveTooLarge(UploadTooLarge):
+    """Raised when archive members add up to more than the batch's byte budget."""
+
+    def __init__(self, max_bytes: int):
+        Exception.__init__(self, f"Archive expands to more than {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+def is_archive(filename: str) -> bool:
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_suffix(filename: str) -> str:
+    lowered = filename.lower()
+    return next(suffix for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True) if lowered.endswith(suffix))
+
+
+# ── Archive Expansion ────────────────────────────────────────────────────────
+
+def expand_archive(archive_path: str, dest_dir: str, max_files: int = BATCH_MAX_FILES,
+                   max_bytes: int = BATCH_MAX_BYTES) -> list:
+    """
+    Streams every PDF member of a zip or tar archive into its own file under
+    dest_dir, hashing on the way. Members are never read fully into memory,
+    each one is held to the normal upload size limit and all of them together
+    to max_bytes, so a small archive can't expand without bound.
+    Returns a list of (member_name, path, sha256_hex).
+    """
+    extracted = []
+    remaining = max_bytes
+
+    def add(name, src):
+        nonlocal remaining
+        if len(extracted) >= max_files:
+            raise TooManyFiles(f"Batch contains more than {max_files} documents")
+
+        path = os.path.join(dest_dir, f"financial_document_{uuid.uuid4()}.pdf")
+        try:
+            size, content_hash = copy_stream(src, path, max_bytes=min(MAX_UPLOAD_BYTES, remaining))
+        except UploadTooLarge:
+            _remove(path)
+            if remaining < MAX_UPLOAD_BYTES:
+                raise ArchiveTooLarge(max_bytes)
+            raise
+        remaining -= size
+        extracted.append((name, path, content_hash))
+
+    try:
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                        with archive.open(info) as src:
+                            add(info.filename, src)
+        else:
+            with tarfile.open(archive_path, mode="r:*") as archive:
+                for member in archive:
+                    if member.isfile() and member.name.lower().endswith(".pdf"):
+                        with archive.extractfile(member) as src:
+                            add(member.name, src)
+
+    except Exception:
+        for _, path, _ in extracted:
+            _remove(path)
+        raise
+
+    return extracted
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,74 @@
+"""
+Benchmark for page-parallel PDF extraction (extraction.ExtractionPool).
+
+Extracts a synthetic annual report (400 pages by default) in-process and
+then with worker pools of increasing size, verifies every run produces
+byte-identical text, and reports the speedup over the in-process baseline.
+Scaling should be close to linear up to the number of physical cores.
+
+    python benchmarks/bench_extract.py
+    python benchmarks/bench_extract.py --pages 400 --workers 1 2 4 8 --repeat 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extraction import ExtractionPool, extract_range, page_count
+from synthetic_pdf import synthetic_filing, KINDS
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--kind", choices=KINDS, default="table")
+    parser.add_argument("--workers", nargs="+", type=int, default=sorted({2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = os.path.join(workdir, "filing.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(synthetic_filing(args.pages, args.kind))
+        pages = page_count(pdf_path)
+
+        baseline_path = os.path.join(workdir, "baseline.txt")
+        baseline = best_of(args.repeat, lambda: extract_range(pdf_path, 0, pages - 1, baseline_path))
+        with open(baseline_path, "rb") as f:
+            expected = f.read()
+
+        print(f"{pages} pages, {len(expected):,} bytes of text, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+        print(f"{'inline':>8} {baseline:>9.3f} {pages / baseline:>9.1f} {1.0:>7.2f}x")
+
+        for workers in args.workers:
+            pool = ExtractionPool(workers=workers)
+            out_path = os.path.join(workdir, f"workers{workers}.txt")
+            try:
+                ## Start the workers (and import pypdf in them) outside the timing
+                pool.extract(pdf_path, out_path)
+                elapsed = best_of(args.repeat, lambda: pool.extract(pdf_path, out_path))
+            finally:
+                pool.shutdown()
+
+            with open(out_path, "rb") as f:
+                if f.read() != expected:
+                    raise AssertionError(f"{workers} workers produced different text")
+            print(f"{workers:>8} {elapsed:>9.3f} {pages / elapsed:>9.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark for normalize.collapse_whitespace.
+
+Times the one-pass normalizer on synthetic filing text from 10 KB to 50 MB
+and reports throughput, which should stay roughly flat if scaling is linear.
+The original quadratic loops are timed on the small sizes only for contrast.
+
+    python benchmarks/bench_normalize.py
+    python benchmarks/bench_normalize.py --sizes 10K 1M 50M --legacy-limit 100K
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalize import collapse_whitespace
+
+
+SAMPLE_PAGE = (
+    "CONSOLIDATED STATEMENTS OF OPERATIONS\n\n\n"
+    "Revenue        96,773     81,462      53,823\n"
+    "Cost of revenue    79,113   65,121    40,217\n\n"
+    "Gross profit      17,660     16,341      13,606\n\n\n\n"
+    "Operating  expenses  include  research  and  development  costs.\n"
+)
+
+UNITS = {"K": 1024, "M": 1024 * 1024}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    if value[-1] in UNITS:
+        return int(float(value[:-1]) * UNITS[value[-1]])
+    return int(value)
+
+
+def synthetic_text(size: int) -> str:
+    repeats = size // len(SAMPLE_PAGE) + 1
+    return (SAMPLE_PAGE * repeats)[:size]
+
+
+def legacy_normalize(text: str) -> str:
+    ## The loops previously in tools.py, kept here only as a baseline
+    while "\n\n" in text:
+        text = text.replace("\n\n", "\n")
+
+    i = 0
+    while i < len(text):
+        if text[i:i+2] == "  ":
+            text = text[:i] + text[i+1:]
+        else:
+            i += 1
+    return text
+
+
+def best_of(fn, text: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["10K", "100K", "1M", "10M", "50M"])
+    parser.add_argument("--legacy-limit", default="100K", help="largest input timed with the old loops")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    legacy_limit = parse_size(args.legacy_limit)
+
+    print(f"{'size':>10} {'seconds':>10} {'MB/s':>10} {'legacy s':>10}")
+    for label in args.sizes:
+        size = parse_size(label)
+        text = synthetic_text(size)
+
+        elapsed = best_of(collapse_whitespace, text, args.repeat)
+        throughput = size / (1024 * 1024) / elapsed if elapsed else float("inf")
+
+        legacy = ""
+        if size <= legacy_limit:
+            legacy = f"{best_of(legacy_normalize, text, 1):10.4f}"
+
+        print(f"{label:>10} {elapsed:10.4f} {throughput:10.1f} {legacy:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+End-to-end service benchmark: synthetic filings, a mock LLM, real API.
+
+Starts the deterministic mock LLM (mock_llm.py) and the API under uvicorn in
+a scratch directory, then drives POST /analyze at a fixed concurrency for
+every corpus scenario (page count x table-heavy/text-heavy). Each request
+uploads a distinct synthetic filing (synthetic_pdf.py), so parsing and
+indexing are measured too, and polls its job to completion.
+
+Reported per scenario: p50/p95/p99 latency (submit to completed job),
+requests/s, peak RSS of the server and its whole process tree (sampled during
+the run; each scenario gets a freshly started server), LLM calls, and
+a per-stage breakdown taken from the /metrics histograms. Runs fully offline
+on CPU. Results are written as JSON so runs can be compared across commits.
+
+    python benchmarks/bench_service.py --pages 10 100 --requests 20 --concurrency 4
+    python benchmarks/bench_service.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm import MockLLMServer
+from synthetic_pdf import synthetic_filing, KINDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FINISHED = ("completed", "failed", "cancelled")
+
+_STAGE_SAMPLE = re.compile(r'^analyzer_stage_duration_seconds_(sum|count)\{stage="([^"]*)"\} (\S+)$')
+
+
+# ── Server Lifecycle ─────────────────────────────────────────────────────────
+
+def start_api(workdir: str, port: int, llm_url: str, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LLM_BASE_URL": llm_url,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "mock"),
+        ## Measure the pipeline, not the caches or our own quota
+        "LLM_MEMO_ENABLED": "true" if args.memo else "false",
+        "LLM_RPM": str(args.llm_rpm),
+        "LLM_TPM": str(args.llm_tpm),
+        "JOB_WORKERS": str(args.job_workers),
+        "JOB_QUEUE_SIZE": str(max(args.concurrency, 16)),
+        "OTEL_EXPORTER_OTLP_ENDPOINT": "",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", ROOT,
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API exited with status {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.05)
+
+    server.terminate()
+    raise TimeoutError("API did not start in time")
+
+
+def stop_api(server: subprocess.Popen):
+    server.terminate()
+    server.wait()
+
+
+def _status_kb(pid: int, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree(pid: int) -> list:
+    """pid and all its live descendants (extraction workers are grandchildren, under the forkserver)."""
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return tree
+
+
+class RssSampler:
+    """
+    Samples the summed resident set size of a process tree in the background.
+    Short-lived workers only show up while they run, so the tree is walked
+    again on every sample; the server's own VmHWM covers peaks in between.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while True:
+            total = sum(_status_kb(pid, "VmRSS:") for pid in process_tree(self.pid))
+            self.peak_kb = max(self.peak_kb, total)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def peak_mb(self) -> float:
+        return round(max(self.peak_kb, _status_kb(self.pid, "VmHWM:")) / 1024, 1)
+
+
+def stage_totals(client: httpx.Client) -> dict:
+    totals = {}
+    for line in client.get("/metrics").text.splitlines():
+        match = _STAGE_SAMPLE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, {"sum": 0.0, "count": 0})[kind] = float(value)
+    return totals
+
+
+# ── Load Generation ──────────────────────────────────────────────────────────
+
+def run_request(client: httpx.Client, pdf: bytes, name: str, mode: str, timeout: float) -> dict:
+    start = time.perf_counter()
+    rejected = 0
+
+    while True:
+        response = client.post(
+            "/analyze",
+            files={"file": (name, pdf, "application/pdf")},
+            data={"query": "Summarize revenue, margins, liquidity and key risks", "mode": mode},
+            headers={"Cache-Control": "no-store"},
+        )
+        if response.status_code != 429:
+            break
+        ## Queue full: back off briefly, as a well-behaved client would
+        rejected += 1
+        time.sleep(min(float(response.headers.get("Retry-After", 1)), 1.0))
+
+    if response.status_code not in (200, 202):
+        return {"status": f"http_{response.status_code}", "latency": time.perf_counter() - start, "rejected": rejected}
+
+    job_id = response.json().get("job_id")
+    status = "completed"
+    while job_id:
+        job = client.get(f"/jobs/{job_id}").json()
+        status = job["status"]
+        if status in FINISHED or time.perf_counter() - start > timeout:
+            break
+        time.sleep(0.05)
+
+    return {"status": status, "latency": time.perf_counter() - start, "rejected": rejected}
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5 - 1e-9)))
+    return round(ordered[min(rank, len(ordered)) - 1], 4)
+
+
+def run_scenario(base_url: str, server: subprocess.Popen, mock: MockLLMServer,
+                 pages: int, kind: str, args) -> dict:
+    print(f"-- {kind}-heavy, {pages} pages: generating {args.requests} filings", flush=True)
+    ## Distinct bytes per request (nonce), identical text layout
+    payloads = [synthetic_filing(pages, kind, args.seed, nonce=f"{pages}-{kind}-{i}") for i in range(args.requests)]
+
+    with httpx.Client(base_url=base_url, timeout=args.request_timeout) as client:
+        before = stage_totals(client)
+        calls_before = mock.calls
+
+        started = time.perf_counter()
+        with RssSampler(server.pid) as rss, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(
+                lambda item: run_request(client, item[1], f"filing_{item[0]}.pdf", args.mode, args.request_timeout),
+                enumerate(payloads),
+            ))
+        wall = time.perf_counter() - started
+
+        after = stage_totals(client)
+
+    latencies = [r["latency"] for r in results if r["status"] == "completed"]
+    stages = {}
+    for stage, total in after.items():
+        count = total["count"] - before.get(stage, {}).get("count", 0)
+        spent = total["sum"] - before.get(stage, {}).get("sum", 0.0)
+        if count:
+            stages[stage] = {"count": int(count), "total_s": round(spent, 4), "mean_s": round(spent / count, 4)}
+
+    return {
+        "pages": pages,
+        "kind": kind,
+        "mode": args.mode,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "completed": len(latencies),
+        "failed": len(results) - len(latencies),
+        "rejected_429": sum(r["rejected"] for r in results),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else None,
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else None,
+            "max": round(max(latencies), 4) if latencies else None,
+        },
+        "peak_rss_mb": rss.peak_mb(),
+        "llm_calls": mock.calls - calls_before,
+        "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["total_s"])),
+    }
+
+
+# ── Reporting ────────────────────────────────────────────────────────────────
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_scenario(result: dict):
+    latency = result["latency_s"]
+    print(f"   {result['completed']}/{result['requests']} ok, {result['throughput_rps']} req/s, "
+          f"p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s, "
+          f"peak RSS {result['peak_rss_mb']} MB, {result['llm_calls']} LLM calls")
+    for stage, timing in list(result["stages"].items())[:8]:
+        print(f"     {stage:<32} {timing['count']:>6} x {timing['mean_s']:>9.4f}s  = {timing['total_s']:>9.3f}s")
+
+
+def scenario_key(result: dict) -> tuple:
+    return result["pages"], result["kind"], result["mode"], result["concurrency"]
+
+
+def compare(results: dict, baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {scenario_key(s): s for s in json.load(f)["scenarios"]}
+
+    def delta(new, old):
+        if new is None or not old:
+            return "   n/a"
+        return f"{(new - old) / old:+6.1%}"
+
+    print(f"\nCompared with {baseline_path}:")
+    print(f"{'scenario':<28} {'p50':>8} {'p95':>8} {'req/s':>8} {'RSS':>8}")
+    for result in results["scenarios"]:
+        old = baseline.get(scenario_key(result))
+        if old is None:
+            continue
+        label = f"{result['kind']} {result['pages']}p {result['mode']} c{result['concurrency']}"
+        print(f"{label:<28} "
+              f"{delta(result['latency_s']['p50'], old['latency_s']['p50']):>8} "
+              f"{delta(result['latency_s']['p95'], old['latency_s']['p95']):>8} "
+              f"{delta(result['throughput_rps'], old['throughput_rps']):>8} "
+              f"{delta(result['peak_rss_mb'], old['peak_rss_mb']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", type=int, default=[10, 100, 500])
+    parser.add_argument("--kind", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--mode", default="standard", choices=("standard", "pipeline", "map_reduce"))
+    parser.add_argument("--requests", type=int, default=20, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--job-workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.5, help="mock LLM base latency per call")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--memo", action="store_true", help="keep the LLM response memo enabled")
+    parser.add_argument("--llm-rpm", type=int, default=1_000_000)
+    parser.add_argument("--llm-tpm", type=int, default=1_000_000_000)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--request-timeout", type=float, default=600.0)
+    parser.add_argument("--output", default=None, help="JSON results file (default: bench-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    workdir = tempfile.mkdtemp(prefix="bench-service-")
+    mock = MockLLMServer(0, args.latency, args.jitter, args.tokens_per_second).start()
+
+    scenarios = []
+    try:
+        for pages in args.pages:
+            for kind in args.kind:
+                ## A fresh server per scenario: VmHWM is a lifetime peak, so a
+                ## shared server would report earlier scenarios' peaks
+                server = start_api(workdir, args.port, mock.base_url, args)
+                try:
+                    result = run_scenario(f"http://127.0.0.1:{args.port}", server, mock, pages, kind, args)
+                finally:
+                    stop_api(server)
+                print_scenario(result)
+                scenarios.append(result)
+    finally:
+        mock.stop()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "scenarios": scenarios,
+    }
+
+    output = args.output or f"bench-{commit or 'local'}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Startup benchmark for the API.
+
+Measures, in fresh interpreters so nothing is already imported:
+  - import time of `main` (the app module uvicorn loads), and
+  - time from launching uvicorn to the first successful GET / response.
+
+Agents, tasks and the LLM client are built lazily, so neither number should
+include crewai/langchain initialization; the components already built after
+import are printed as a check.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --port 8123
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = (
+    "import time; start = time.perf_counter(); import main; "
+    "elapsed = time.perf_counter() - start; "
+    "from registry import registry; "
+    "print(elapsed, ','.join(registry.built()) or '-')"
+)
+
+
+def time_import() -> tuple:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[-2]), output[-1]
+
+
+def time_first_response(port: int, timeout: float) -> float:
+    url = f"http://127.0.0.1:{port}/"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise TimeoutError(f"no response from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(label: str, timings: list):
+    print(f"{label:<22} median {statistics.median(timings):8.3f}s   "
+          f"min {min(timings):8.3f}s   max {max(timings):8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--skip-server", action="store_true", help="only measure the import time")
+    args = parser.parse_args()
+
+    imports, built = [], "-"
+    for _ in range(args.repeat):
+        elapsed, built = time_import()
+        imports.append(elapsed)
+    summarize("import main", imports)
+    print(f"{'built at import':<22} {built}")
+
+    if not args.skip_server:
+        responses = [time_first_response(args.port, args.timeout) for _ in range(args.repeat)]
+        summarize("first GET / response", responses)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Deterministic, OpenAI-compatible mock LLM server for offline benchmarks.
+
+Point the API at it with LLM_BASE_URL=http://127.0.0.1:<port>/v1 (any
+OPENAI_API_KEY value works). Every agent call then goes through the real
+stack (crewai, litellm, the rate limiter, the memo and the shared HTTP pool)
+and only the model is replaced. Responses depend solely on the request
+messages, and latency is a fixed base plus a per-token cost with
+deterministic jitter, so runs are comparable across commits.
+
+    python benchmarks/mock_llm.py --port 8400 --latency 0.5 --tokens-per-second 200
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SENTENCES = (
+    "Revenue increased year over year, driven by higher volumes and stable pricing.",
+    "Gross margin contracted slightly as input costs rose faster than prices.",
+    "Operating cash flow covered capital expenditures with room to spare.",
+    "Liquidity remains adequate, with a current ratio comfortably above one.",
+    "Leverage is moderate; long-term debt is well below shareholders' equity.",
+    "Management flags supply chain and interest rate exposure as key risks.",
+    "Segment results were mixed, with growth concentrated in the largest segment.",
+    "No going concern or material weakness disclosures were identified.",
+)
+
+
+def completion_text(messages: list, sentences: int) -> str:
+    prompt = "\n".join(str(m.get("content") or "") for m in messages)
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+    body = " ".join(rng.choice(SENTENCES) for _ in range(sentences))
+    if "VERDICT" in prompt:
+        body = "VERDICT: PASS\nThe document contains audited financial statements.\n" + body
+    ## ReAct format, so crewai agents finish in one step
+    return f"Thought: I now know the final answer\nFinal Answer: {body}"
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    server_version = "MockLLM/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._json(200, {"calls": self.server.calls})
+        elif self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = request.get("messages", [])
+        text = completion_text(messages, self.server.sentences)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        completion_tokens = estimate_tokens(text)
+
+        with self.server.lock:
+            self.server.calls += 1
+
+        ## Deterministic jitter, derived from the response itself
+        jitter = (int(hashlib.md5(text.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF - 0.5) * 2 * self.server.jitter
+        time.sleep(max(0.0, self.server.latency + jitter))
+
+        model = request.get("model", "mock")
+        if request.get("stream"):
+            self._stream(model, text, prompt_tokens, completion_tokens)
+            return
+
+        time.sleep(completion_tokens / self.server.tokens_per_second)
+        self._json(200, {
+            "id": f"chatcmpl-{hashlib.md5(text.encode()).hexdigest()[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _stream(self, model: str, text: str, prompt_tokens: int, completion_tokens: int):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        words = text.split(" ")
+        delay = completion_tokens / self.server.tokens_per_second / max(len(words), 1)
+        for i, word in enumerate(words):
+            chunk = word if i == 0 else " " + word
+            self._event({"object": "chat.completion.chunk", "model": model, "choices": [
+                {"index": 0, "delta": {"content": chunk}, "finish_reason": None}]})
+            time.sleep(delay)
+
+        self._event({"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                     "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                               "total_tokens": prompt_tokens + completion_tokens}})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _event(self, payload: dict):
+        self.wfile.write(b"data: " + json.dumps(payload).encode() + b"\n\n")
+        self.wfile.flush()
+
+    def _json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.5, jitter: float = 0.1,
+                 tokens_per_second: float = 200.0, sentences: int = 12):
+        super().__init__(("127.0.0.1", port), MockLLMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.sentences = sentences
+        self.calls = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--latency", type=float, default=0.5, help="base seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds, deterministic per response")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--sentences", type=int, default=12, help="length of each answer")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.port, args.latency, args.jitter, args.tokens_per_second, args.sentences)
+    print(f"Mock LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
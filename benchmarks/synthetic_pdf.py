@@ -0,0 +1,240 @@
+"""
+Deterministic synthetic financial filings for benchmarks.
+
+Writes plain-text PDFs (one Helvetica text stream per page) without any PDF
+library, shaped like a 10-K: a cover page, Item headings the chunker
+recognizes, prose sections, and statement tables whose rows the financial
+metrics engine extracts. The same (pages, kind, seed) always produces the
+same text; `nonce` only changes the document metadata, so many uploads of one
+layout still hash (and therefore parse) separately.
+
+    python benchmarks/synthetic_pdf.py --pages 10 100 500 --kind table text --out corpus/
+"""
+import argparse
+import os
+import random
+
+## Letter size, 9pt text on 11pt leading
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+LINES_PER_PAGE = 62
+LINE_WIDTH = 95
+
+KINDS = ("table", "text")
+
+## Share of body pages that are tables, per kind
+TABLE_SHARE = {"table": 0.7, "text": 0.1}
+
+SECTIONS = (
+    "Item 1. Business",
+    "Item 1A. Risk Factors",
+    "Item 7. Management's Discussion and Analysis of Financial Condition and Results of Operations",
+    "Item 7A. Quantitative and Qualitative Disclosures About Market Risk",
+    "Item 8. Financial Statements and Supplementary Data",
+    "Notes to Consolidated Financial Statements",
+)
+
+WORDS = (
+    "revenue growth margin customers demand supply chain competition regulatory "
+    "liquidity capital expenditures operating segment pricing inflation interest "
+    "rates currency exposure credit facility covenants impairment goodwill "
+    "inventory receivables backlog guidance headcount restructuring litigation "
+    "cybersecurity tariffs commodity costs fiscal quarter results outlook "
+    "uncertainty material adverse effect our business could be affected by"
+).split()
+
+## Primary statements: labels match the patterns in financials.LINE_ITEMS
+STATEMENTS = (
+    ("CONSOLIDATED STATEMENTS OF OPERATIONS", (
+        ("Total revenues", 1.0),
+        ("Cost of revenues", 0.62),
+        ("Gross profit", 0.38),
+        ("Research and development", 0.08),
+        ("Selling, general and administrative", 0.11),
+        ("Operating income", 0.19),
+        ("Interest expense", 0.01),
+        ("Net income", 0.14),
+    )),
+    ("CONSOLIDATED BALANCE SHEETS", (
+        ("Cash and cash equivalents", 0.35),
+        ("Accounts receivable, net", 0.18),
+        ("Inventories", 0.22),
+        ("Total current assets", 0.81),
+        ("Property, plant and equipment, net", 0.64),
+        ("Total assets", 1.92),
+        ("Total current liabilities", 0.47),
+        ("Long-term debt", 0.41),
+        ("Total liabilities", 1.02),
+        ("Total stockholders' equity", 0.90),
+    )),
+    ("CONSOLIDATED STATEMENTS OF CASH FLOWS", (
+        ("Net income", 0.14),
+        ("Depreciation and amortization", 0.05),
+        ("Net cash provided by operating activities", 0.21),
+        ("Capital expenditures", -0.07),
+        ("Net cash used in investing activities", -0.09),
+    )),
+)
+
+YEARS = ("2024", "2023", "2022")
+
+
+# ── Page Text ────────────────────────────────────────────────────────────────
+
+def _amount(value: float) -> str:
+    text = f"{abs(value):,.0f}"
+    return f"({text})" if value < 0 else text
+
+
+def _table_row(label: str, values) -> str:
+    cells = "".join(f"{_amount(v):>14}" for v in values)
+    return f"{label:<48}{cells}"
+
+
+def statement_page(title: str, rows, scale: float) -> list:
+    lines = [title, "(in millions, except per share data)", "", f"{'':<48}" + "".join(f"{y:>14}" for y in YEARS), ""]
+    for label, ratio in rows:
+        lines.append(_table_row(label, [ratio * scale * (1 - 0.08 * i) for i in range(len(YEARS))]))
+    return lines
+
+
+def table_page(rng: random.Random, scale: float) -> list:
+    lines = [f"Segment Information (continued) - Schedule {rng.randint(1, 99)}", "(in millions)", "",
+             f"{'':<48}" + "".join(f"{y:>14}" for y in YEARS)]
+    while len(lines) < LINES_PER_PAGE:
+        label = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).capitalize()
+        base = scale * rng.uniform(0.001, 0.2) * rng.choice((1, 1, 1, -1))
+        lines.append(_table_row(label[:46], [base * rng.uniform(0.85, 1.15) for _ in YEARS]))
+    return lines
+
+
+def text_page(rng: random.Random, heading: str = None) -> list:
+    lines = [heading, ""] if heading else []
+    while len(lines) < LINES_PER_PAGE:
+        paragraph = "".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 24))).capitalize() + ". "
+            for _ in range(rng.randint(2, 6))
+        ).strip()
+        while len(paragraph) > LINE_WIDTH and len(lines) < LINES_PER_PAGE:
+            cut = paragraph.rfind(" ", 0, LINE_WIDTH)
+            lines.append(paragraph[:cut])
+            paragraph = paragraph[cut + 1:]
+        if len(lines) < LINES_PER_PAGE:
+            lines.append(paragraph)
+        if rng.random() < 0.15 and len(lines) < LINES_PER_PAGE:
+            lines.append("")
+    return lines
+
+
+def filing_pages(pages: int, kind: str = "table", seed: int = 0) -> list:
+    """Returns the text lines of every page of a synthetic annual report."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+
+    rng = random.Random(f"{pages}:{kind}:{seed}")
+    scale = rng.choice((850, 4200, 96000))
+    company = f"Synthetic Holdings {seed} Inc."
+
+    result = [[
+        "UNITED STATES SECURITIES AND EXCHANGE COMMISSION",
+        "FORM 10-K",
+        "ANNUAL REPORT PURSUANT TO SECTION 13 OR 15(d) OF THE SECURITIES EXCHANGE ACT OF 1934",
+        f"For the fiscal year ended December 31, {YEARS[0]}",
+        company,
+    ]]
+
+    body = pages - 1
+    section_starts = {int(body * i / len(SECTIONS)): SECTIONS[i] for i in range(len(SECTIONS))}
+    statements_at = int(body * 4 / len(SECTIONS))
+
+    for index in range(body):
+        if len(result) >= pages:
+            break
+        heading = section_starts.get(index)
+        if statements_at <= index < statements_at + len(STATEMENTS):
+            title, rows = STATEMENTS[index - statements_at]
+            page = statement_page(title, rows, scale)
+            if heading:
+                page = [heading, ""] + page
+        elif rng.random() < TABLE_SHARE[kind]:
+            page = ([heading, ""] if heading else []) + table_page(rng, scale)
+        else:
+            page = text_page(rng, heading)
+        result.append(page[:LINES_PER_PAGE])
+
+    return result
+
+
+# ── PDF Writer ───────────────────────────────────────────────────────────────
+
+def _escape(text: str) -> bytes:
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return text.encode("latin-1", "replace")
+
+
+def _content_stream(lines: list) -> bytes:
+    parts = [b"BT /F1 9 Tf 11 TL 36 756 Td"]
+    for line in lines:
+        parts.append(b"(" + _escape(line) + b") Tj T*")
+    parts.append(b"ET")
+    return b"\n".join(parts)
+
+
+def render_pdf(pages: list, title: str = "Synthetic filing", nonce: str = "") -> bytes:
+    """Serializes pages of text lines into a minimal, valid PDF 1.4 file."""
+    page_count = len(pages)
+    ## Object numbers: 1 catalog, 2 page tree, 3 font, 4 info, then (page, content) pairs
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        4: b"<< /Title (" + _escape(title) + b") /Producer (synthetic_pdf " + _escape(nonce) + b") >>",
+    }
+    kids = []
+    for i, lines in enumerate(pages):
+        page_id, content_id = 5 + 2 * i, 6 + 2 * i
+        kids.append(f"{page_id} 0 R".encode())
+        stream = _content_stream(lines)
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+    objects[2] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % page_count
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+
+    xref = len(out)
+    size = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for number in range(1, size):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref)
+    return bytes(out)
+
+
+def synthetic_filing(pages: int, kind: str = "table", seed: int = 0, nonce: str = "") -> bytes:
+    return render_pdf(filing_pages(pages, kind, seed), f"Synthetic {kind} filing, {pages} pages", nonce)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", type=int, default=[10, 100, 500])
+    parser.add_argument("--kind", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="corpus")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for pages in args.pages:
+        for kind in args.kind:
+            path = os.path.join(args.out, f"filing_{kind}_{pages}p.pdf")
+            with open(path, "wb") as f:
+                f.write(synthetic_filing(pages, kind, args.seed))
+            print(f"{path}  {os.path.getsize(path):,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "86400"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+# ── Cache Keys ───────────────────────────────────────────────────────────────
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of the user's query."""
+    return " ".join(query.lower().split())
+
+
+def result_cache_key(content_hash: str, query: str, model: str, prompt_version: str,
+                     mode: str = "standard") -> str:
+    """
+    Content-addressed key for an analysis: the same PDF bytes, asked the same
+    question, by the same model with the same task prompts (and analysis mode),
+    gives the same answer.
+    """
+    material = "\x1f".join([content_hash, normalize_query(query), model, prompt_version, mode])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# ── Result Cache ─────────────────────────────────────────────────────────────
+
+class ResultCache:
+    """
+    In-process LRU cache with a TTL, bounded both by entry count and by the
+    approximate size of the cached analyses. An optional loader is consulted on
+    a miss (e.g. the database) and its value is promoted into memory.
+    """
+
+    def __init__(self, ttl: int = RESULT_CACHE_TTL,
+                 max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, loader=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value, size = entry
+                if time.time() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._discard(key)
+
+        value = loader(key) if loader is not None else None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        self.put(key, value)
+        return value
+
+    def put(self, key: str, value):
+        size = _approximate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+
+            self._entries[key] = (time.time(), value, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _discard(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+def _approximate_size(value) -> int:
+    if isinstance(value, dict):
+        return sum(_approximate_size(v) for v in value.values()) + sys.getsizeof(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return sys.getsizeof(value)
+
+
+result_cache = ResultCache()
@@ -0,0 +1,144 @@
+import os
+import re
+from collections import namedtuple
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "6000"))
+
+## Rough English-text ratio; good enough to bound prompt size without a tokenizer
+CHARS_PER_TOKEN = 4
+
+## Lines longer than this are body text, not headings
+_MAX_HEADING_LENGTH = 160
+
+
+Chunk = namedtuple("Chunk", "index section start_page end_page text")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# ── Section Headings ─────────────────────────────────────────────────────────
+## Checked in order; the first match names the section that starts on that line.
+## Item numbers cover both 10-K (Item 7 MD&A, Item 8 statements) and
+## 10-Q (Item 2 MD&A, Item 1 statements) layouts.
+
+SECTION_HEADINGS = [
+    ("Risk Factors", re.compile(r"^\s*item\s*1a\b.*risk\s+factors", re.IGNORECASE)),
+    ("Market Risk", re.compile(r"^\s*item\s*(7a|3)\b.*market\s+risk", re.IGNORECASE)),
+    ("MD&A", re.compile(r"^\s*item\s*[27]\b.*management.s\s+discussion", re.IGNORECASE)),
+    ("Financial Statements", re.compile(r"^\s*item\s*[18]\b.*financial\s+statements", re.IGNORECASE)),
+    ("Business", re.compile(r"^\s*item\s*1\b[.:]?\s*business", re.IGNORECASE)),
+    ("Income Statement", re.compile(
+        r"^\s*(condensed\s+)?consolidated\s+statements?\s+of\s+(operations|income|earnings)", re.IGNORECASE)),
+    ("Balance Sheet", re.compile(r"^\s*(condensed\s+)?consolidated\s+balance\s+sheets?", re.IGNORECASE)),
+    ("Cash Flow Statement", re.compile(
+        r"^\s*(condensed\s+)?consolidated\s+statements?\s+of\s+cash\s+flows?", re.IGNORECASE)),
+    ("Notes to Financial Statements", re.compile(
+        r"^\s*notes\s+to\s+(the\s+)?(condensed\s+)?consolidated\s+financial\s+statements", re.IGNORECASE)),
+]
+
+_GENERIC_ITEM = re.compile(r"^\s*(item\s*\d+[a-z]?)[.:]\s+(\S.*)$", re.IGNORECASE)
+
+
+def match_heading(line: str):
+    if len(line) > _MAX_HEADING_LENGTH:
+        return None
+
+    for title, pattern in SECTION_HEADINGS:
+        if pattern.search(line):
+            return title
+
+    match = _GENERIC_ITEM.match(line)
+    if match:
+        return f"{match.group(1).title()}. {match.group(2).strip()}"
+    return None
+
+
+# ── Section Splitting ────────────────────────────────────────────────────────
+
+def iter_sections(pages):
+    """
+    Walks (page_number, text) pairs and yields (title, lines) per section,
+    where lines is a list of (page_number, line). Only one section is held
+    in memory at a time.
+    """
+    title = "Front Matter"
+    lines = []
+
+    for number, text in pages:
+        for line in text.splitlines(keepends=True):
+            heading = match_heading(line)
+            if heading and lines:
+                yield title, lines
+                lines = []
+            if heading:
+                title = heading
+            lines.append((number, line))
+
+    if lines:
+        yield title, lines
+
+
+def _split_section(title: str, lines: list, max_chars: int):
+    """Cuts one section into pieces of at most max_chars on line boundaries."""
+    piece, size = [], 0
+
+    for number, line in lines:
+        ## A single line longer than the budget is hard-cut
+        while len(line) > max_chars:
+            if piece:
+                yield title, piece
+                piece, size = [], 0
+            yield title, [(number, line[:max_chars])]
+            line = line[max_chars:]
+
+        if size + len(line) > max_chars and piece:
+            yield title, piece
+            piece, size = [], 0
+
+        piece.append((number, line))
+        size += len(line)
+
+    if piece:
+        yield title, piece
+
+
+def chunk_document(pages, max_tokens: int = CHUNK_MAX_TOKENS):
+    """
+    Yields section-aware Chunks of at most max_tokens (estimated). Large
+    sections are split; consecutive small sections (e.g. table-of-contents
+    entries) are packed together so no chunk is wastefully tiny.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    index = 0
+    titles, piece, size = [], [], 0
+
+    def build(index, titles, piece):
+        return Chunk(
+            index=index,
+            section="; ".join(titles),
+            start_page=piece[0][0],
+            end_page=piece[-1][0],
+            text="".join(line for _, line in piece),
+        )
+
+    for title, lines in iter_sections(pages):
+        for part_title, part in _split_section(title, lines, max_chars):
+            part_size = sum(len(line) for _, line in part)
+
+            if piece and size + part_size > max_chars:
+                yield build(index, titles, piece)
+                index += 1
+                titles, piece, size = [], [], 0
+
+            if part_title not in titles:
+                titles.append(part_title)
+            piece.extend(part)
+            size += part_size
+
+    if piece:
+        yield build(index, titles, piece)
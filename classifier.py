@@ -0,0 +1,212 @@
+import math
+import os
+import re
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+## Local pre-verification: a cheap look at the parsed text decides whether an
+## upload is a financial filing at all before any agent runs. Clear junk is
+## rejected, clear filings skip the LLM verifier, and only the documents in
+## between are sent to it.
+
+## Probability (of being a financial document) below which uploads are rejected
+CLASSIFIER_REJECT_BELOW = float(os.getenv("CLASSIFIER_REJECT_BELOW", "0.2"))
+
+## Probability at or above which the LLM verifier is skipped
+CLASSIFIER_ACCEPT_ABOVE = float(os.getenv("CLASSIFIER_ACCEPT_ABOVE", "0.9"))
+
+## Pages sampled (spread evenly over the document) for keyword and table counts
+CLASSIFIER_SAMPLE_PAGES = int(os.getenv("CLASSIFIER_SAMPLE_PAGES", "40"))
+
+## Less extracted text than this means a scan, an image-only deck or an empty PDF
+MIN_TEXT_CHARS = 200
+
+## Pages checked for cover-page form markers (FORM 10-K, press release, ...)
+COVER_PAGES = 2
+
+## Decisions
+ACCEPT = "accept"
+REJECT = "reject"
+AMBIGUOUS = "ambiguous"
+
+UNKNOWN = "unknown"
+
+
+# ── Signals ──────────────────────────────────────────────────────────────────
+
+_FINANCIAL_TERMS = re.compile(
+    r"\b(revenues?|net\s+(?:income|loss|sales)|earnings\s+per\s+share|diluted|operating\s+income|"
+    r"gross\s+(?:profit|margin)|total\s+assets|liabilities|(?:stockholders|shareholders)['’]?\s+equity|"
+    r"cash\s+flows?|balance\s+sheets?|fiscal|quarter(?:ly)?|ebitda|dividends?|segments?|gaap|"
+    r"depreciation|amortization|audit(?:ed|or)?|securities\s+and\s+exchange\s+commission)\b",
+    re.IGNORECASE,
+)
+
+## Primary statements; a filing normally has all three
+_STATEMENT_HEADINGS = (
+    re.compile(r"statements?\s+of\s+(?:consolidated\s+)?(?:operations|income|earnings)", re.IGNORECASE),
+    re.compile(r"balance\s+sheets?|statements?\s+of\s+financial\s+position", re.IGNORECASE),
+    re.compile(r"statements?\s+of\s+(?:consolidated\s+)?cash\s+flows?", re.IGNORECASE),
+)
+
+## (pattern, weight) per document type; markers on the cover pages count double
+DOCUMENT_TYPES = {
+    "10-K": (
+        (r"form\s+10-k\b", 3.0),
+        (r"annual\s+report\s+pursuant", 3.0),
+        (r"for\s+the\s+fiscal\s+year\s+ended", 2.0),
+        (r"item\s+7\.\s+management", 1.0),
+        (r"item\s+8\.\s+financial\s+statements", 1.0),
+    ),
+    "10-Q": (
+        (r"form\s+10-q\b", 3.0),
+        (r"quarterly\s+report\s+pursuant", 3.0),
+        (r"for\s+the\s+quarterly\s+period\s+ended", 2.0),
+        (r"\b(?:three|six|nine)\s+months\s+ended", 1.0),
+        (r"item\s+2\.\s+management", 1.0),
+    ),
+    "earnings_release": (
+        (r"\b(?:press|news)\s+release\b", 2.0),
+        (r"\breports?\s+(?:first|second|third|fourth|q[1-4]|full[-\s]year)\b[^.\n]{0,60}\bresults\b", 2.0),
+        (r"\bexhibit\s+99", 1.5),
+        (r"conference\s+call|webcast", 1.5),
+        (r"\bnon-gaap\b", 1.0),
+        (r"investor\s+relations|media\s+contact", 1.0),
+    ),
+}
+
+_TYPE_MARKERS = {
+    name: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in markers]
+    for name, markers in DOCUMENT_TYPES.items()
+}
+
+## Below this marker score the document type is reported as unknown
+MIN_TYPE_SCORE = 2.0
+
+
+# ── Scoring Model ────────────────────────────────────────────────────────────
+## Logistic model over features scaled to 0..1. The weights are hand-set so
+## that a complete filing scores near 1, a long finance-flavoured article or
+## a slide deck lands in the ambiguous band, and receipts and scans score near 0.
+
+WEIGHTS = {
+    "financial_terms": 2.5,   # financial vocabulary per 1,000 words, saturating at 20
+    "table_rows": 1.0,        # share of lines that are label + numeric cells, saturating at 20%
+    "line_items": 4.0,        # share of the canonical statement rows found
+    "statements": 2.0,        # share of the three primary statements with a heading
+    "periods": 1.0,           # a fiscal-year column header was found
+    "length": 1.5,            # words sampled, saturating at 2,000
+}
+BIAS = -5.0
+
+
+def _sigmoid(z: float) -> float:
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+# ── Classification ───────────────────────────────────────────────────────────
+
+class Classification:
+    def __init__(self, decision: str, probability: float, document_type: str,
+                 type_confidence: float, features: dict, reason: str = None):
+        self.decision = decision
+        self.probability = probability
+        self.document_type = document_type
+        self.type_confidence = type_confidence
+        self.features = features
+        self.reason = reason
+
+    def verification_text(self) -> str:
+        """The classification in the verifier's output format, for the merged report."""
+        verdict = "FAIL" if self.decision == REJECT else "PASS"
+        detail = self.reason or (
+            f"Classified locally as {self.document_type} "
+            f"(financial document probability {self.probability:.2f})."
+        )
+        return f"VERDICT: {verdict}\n{detail}"
+
+    def to_dict(self) -> dict:
+        return {
+            "decision": self.decision,
+            "probability": round(self.probability, 4),
+            "document_type": self.document_type,
+            "type_confidence": round(self.type_confidence, 4),
+            "features": {name: round(value, 4) for name, value in self.features.items()},
+            "reason": self.reason,
+        }
+
+
+def sample_pages(document, limit: int = CLASSIFIER_SAMPLE_PAGES) -> list:
+    """Returns (page_number, text) for up to `limit` pages spread evenly over the document."""
+    count = document.page_count
+    if count <= limit:
+        return list(document.pages())
+    if limit <= 1:
+        return [(1, document.text(1, 1))] if limit == 1 else []
+    numbers = sorted({1 + round(i * (count - 1) / (limit - 1)) for i in range(limit)})
+    return [(number, document.text(number, number)) for number in numbers]
+
+
+def classify_document(document, metrics=None) -> Classification:
+    """
+    Classifies an ExtractedDocument in milliseconds from its text (and, when
+    given, its FinancialMetrics): whether it is a financial document at all,
+    and whether it looks like a 10-K, a 10-Q or an earnings release.
+    """
+    from financials import iter_table_rows, LINE_ITEMS
+
+    pages = sample_pages(document)
+    text = "\n".join(page for _, page in pages)
+
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        return Classification(REJECT, 0.0, UNKNOWN, 0.0, {"chars": len(text.strip())},
+                              reason="The document has almost no extractable text (empty, scanned or image-only).")
+
+    words = len(text.split())
+    lines = sum(1 for line in text.splitlines() if line.strip())
+    table_rows = sum(1 for _ in iter_table_rows(pages))
+
+    features = {
+        "financial_terms": min(len(_FINANCIAL_TERMS.findall(text)) * 1000 / max(words, 1) / 20, 1.0),
+        "table_rows": min(table_rows / max(lines, 1) / 0.2, 1.0),
+        "line_items": 0.0,
+        "statements": sum(1 for heading in _STATEMENT_HEADINGS if heading.search(text)) / len(_STATEMENT_HEADINGS),
+        "periods": 0.0,
+        "length": min(words / 2000, 1.0),
+    }
+    if metrics is not None:
+        features["line_items"] = int(metrics.line_items.notna().any(axis=1).sum()) / len(LINE_ITEMS)
+        features["periods"] = 1.0 if metrics.periods else 0.0
+
+    probability = _sigmoid(BIAS + sum(WEIGHTS[name] * value for name, value in features.items()))
+    document_type, type_confidence = _document_type(pages)
+
+    if probability < CLASSIFIER_REJECT_BELOW:
+        decision = REJECT
+        reason = f"The document does not look like a financial filing (probability {probability:.2f})."
+    elif probability >= CLASSIFIER_ACCEPT_ABOVE:
+        decision, reason = ACCEPT, None
+    else:
+        decision, reason = AMBIGUOUS, None
+
+    return Classification(decision, probability, document_type, type_confidence, features, reason)
+
+
+def _document_type(pages: list):
+    """Returns (type, softmax confidence) from weighted form markers, or (unknown, 0)."""
+    cover = "\n".join(text for _, text in pages[:COVER_PAGES])
+    body = "\n".join(text for _, text in pages[COVER_PAGES:])
+
+    scores = {}
+    for name, markers in _TYPE_MARKERS.items():
+        scores[name] = sum(
+            weight * (2 if pattern.search(cover) else 1 if pattern.search(body) else 0)
+            for pattern, weight in markers
+        )
+
+    best = max(scores, key=scores.get)
+    if scores[best] < MIN_TYPE_SCORE:
+        return UNKNOWN, 0.0
+
+    total = sum(math.exp(score) for score in scores.values())
+    return best, math.exp(scores[best]) / total
@@ -0,0 +1,33 @@
+import zlib
+
+## zstandard is optional; zlib from the standard library is the fallback
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# ── Codecs ───────────────────────────────────────────────────────────────────
+
+ZSTD = "zstd"
+ZLIB = "zlib"
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+
+DEFAULT_CODEC = ZSTD if zstandard is not None else ZLIB
+
+
+def compress(text: str, codec: str = DEFAULT_CODEC) -> bytes:
+    data = text.encode("utf-8")
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(data: bytes, codec: str) -> str:
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed analyses")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
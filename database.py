@@ -1,14 +1,69 @@
-from sqlalchemy import create_engine
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-# SQLite database file
-DATABASE_URL = "sqlite:///./analysis.db"
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Database location; any SQLAlchemy URL works (e.g. postgresql+psycopg2://...)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./analysis.db")
+
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+# Connection tuning
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Write-behind batching
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "50"))
+DB_WRITE_BATCH_INTERVAL = float(os.getenv("DB_WRITE_BATCH_INTERVAL", "0.2"))
+DB_WRITE_RETRIES = int(os.getenv("DB_WRITE_RETRIES", "5"))
+
 
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Required for SQLite
-)
+if IS_SQLITE:
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={
+            "check_same_thread": False,  # Required for SQLite
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+    )
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        # WAL lets readers proceed while a writer commits; NORMAL sync is safe under WAL
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.close()
+
 
 # Session factory
 SessionLocal = sessionmaker(
@@ -18,4 +73,145 @@ SessionLocal = sessionmaker(
 )
 
 # Base class for models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+# ─────────────────────────────────────────────────────────────
+# Session Helpers
+# ─────────────────────────────────────────────────────────────
+def get_db():
+    """FastAPI dependency: one session per request, always closed."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def session_scope():
+    """Transactional scope: commits on success, rolls back on any error."""
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# ─────────────────────────────────────────────────────────────
+# Batched Write-Behind
+# ─────────────────────────────────────────────────────────────
+class BatchWriter:
+    """
+    Background thread that commits ORM objects in batches. Many concurrent
+    analyses turn into a few short write transactions instead of one per
+    result, which keeps SQLite's single writer lock mostly free.
+    submit() returns a Future that resolves to the persisted copy once committed.
+    """
+
+    def __init__(self, batch_size: int = DB_WRITE_BATCH_SIZE,
+                 interval: float = DB_WRITE_BATCH_INTERVAL,
+                 retries: int = DB_WRITE_RETRIES):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retries = retries
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, record) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((record, future))
+        return future
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = None):
+        """Blocks until everything submitted so far has been written."""
+        self.submit(None).result(timeout=timeout)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            with span("db_write", records=len(batch)):
+                self._write(batch)
+
+    def _write(self, batch):
+        records = [record for record, _ in batch if record is not None]
+
+        try:
+            written = iter(self._commit(records))
+        except OperationalError as e:
+            logger.exception("Batch write failed after %d attempts", self.retries + 1)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        except Exception as e:
+            if len(records) <= 1:
+                logger.exception("Batch write failed")
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+
+            # One bad record must not fail the rest: write them one at a time
+            # so only the offending record's future gets the error
+            logger.exception("Batch write failed; writing its %d records one by one", len(records))
+            for record, future in batch:
+                if record is None:
+                    future.set_result(None)
+                    continue
+                try:
+                    future.set_result(self._commit([record])[0])
+                except Exception as e:
+                    logger.exception("Record write failed")
+                    future.set_exception(e)
+            return
+
+        for record, future in batch:
+            future.set_result(next(written) if record is not None else None)
+
+    def _commit(self, records) -> list:
+        """Writes records in one transaction and returns their persisted copies."""
+        for attempt in range(self.retries + 1):
+            try:
+                with session_scope() as db:
+                    # merge() reuses rows that already exist (e.g. deduplicated blobs);
+                    # flushing each one lets later records in the batch see them too
+                    written = []
+                    for record in records:
+                        written.append(db.merge(record))
+                        db.flush()
+                    # Detach so ids and defaults stay readable after the session closes
+                    db.expunge_all()
+                return written
+            except (OperationalError, IntegrityError):
+                # "database is locked" survives busy_timeout only under heavy contention;
+                # an IntegrityError means another writer inserted the same blob first
+                if attempt == self.retries:
+                    raise
+                time.sleep(min(0.05 * 2 ** attempt, 2.0))
+
+
+result_writer = BatchWriter()
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "data/extracted")
+
+TEXT_FILE = "text.txt"
+INDEX_FILE = "pages.json"
+
+## Number of (path, size, mtime) -> hash entries and open page indexes remembered
+HASH_MEMO_SIZE = 4096
+DOCUMENT_MEMO_SIZE = 256
+
+## Bump when the stored page text changes shape (e.g. normalization rules)
+STORE_VERSION = 2
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ── Extracted Document ───────────────────────────────────────────────────────
+
+class ExtractedDocument:
+    """
+    Parsed text of one PDF, stored on disk as a single UTF-8 file plus the
+    byte offsets of every page. Page ranges are sliced out of a read-only
+    mmap, so only the requested pages are ever decoded into Python strings.
+    """
+
+    def __init__(self, content_hash: str, directory: str, offsets: list):
+        self.content_hash = content_hash
+        self.directory = directory
+        self.offsets = offsets
+
+    @property
+    def page_count(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def text_path(self) -> str:
+        return os.path.join(self.directory, TEXT_FILE)
+
+    def text(self, start_page: int = None, end_page: int = None) -> str:
+        """Returns pages start_page..end_page (1-based, inclusive) as one string."""
+        first, last = self._page_bounds(start_page, end_page)
+        if first > last:
+            return ""
+
+        with self._mapped() as mm:
+            return mm[self.offsets[first][0]:self.offsets[last][1]].decode("utf-8")
+
+    def pages(self, start_page: int = None, end_page: int = None):
+        """Yields (page_number, text) for each page in the range."""
+        first, last = self._page_bounds(start_page, end_page)
+
+        with self._mapped() as mm:
+            for number in range(first, last + 1):
+                begin, end = self.offsets[number]
+                yield number + 1, mm[begin:end].decode("utf-8")
+
+    @contextmanager
+    def _mapped(self):
+        ## mmap refuses zero-length files (e.g. a PDF with no text layer)
+        if not self.offsets or self.offsets[-1][1] == 0:
+            yield b""
+            return
+
+        with open(self.text_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+    def _page_bounds(self, start_page: int = None, end_page: int = None):
+        first = max((start_page or 1), 1) - 1
+        last = min((end_page or self.page_count), self.page_count) - 1
+        return first, last
+
+
+# ── Document Store ───────────────────────────────────────────────────────────
+
+class DocumentStore:
+    """
+    Content-addressed store of extracted PDF text, shared by every tool
+    instance in the process. Each document is parsed at most once; later
+    lookups (other tasks, agent retries, re-uploads) reuse the files on disk.
+    """
+
+    def __init__(self, root: str = DOCUMENT_STORE_DIR):
+        self.root = root
+        self._documents = OrderedDict()
+        self._hashes = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> ExtractedDocument:
+        return self.get(self.content_hash(path), path)
+
+    def content_hash(self, path: str) -> str:
+        ## Avoid re-hashing the same upload on every tool call
+        signature = _file_signature(path)
+
+        with self._lock:
+            content_hash = self._hashes.get(signature)
+        if content_hash is None:
+            content_hash = file_sha256(path)
+            self._remember(signature, content_hash)
+        return content_hash
+
+    def register(self, path: str, content_hash: str):
+        """Records a hash computed elsewhere (e.g. while streaming the upload)."""
+        self._remember(_file_signature(path), content_hash)
+
+    def _remember(self, signature, content_hash: str):
+        with self._lock:
+            self._hashes[signature] = content_hash
+            while len(self._hashes) > HASH_MEMO_SIZE:
+                self._hashes.popitem(last=False)
+
+    def get(self, content_hash: str, path: str) -> ExtractedDocument:
+        with self._lock:
+            document = self._documents.get(content_hash)
+            if document is not None:
+                self._documents.move_to_end(content_hash)
+                return document
+            key_lock = self._locks.setdefault(content_hash, threading.Lock())
+
+        ## One extraction per document even when several tasks ask at once
+        with key_lock:
+            with self._lock:
+                document = self._documents.get(content_hash)
+            if document is None:
+                document = self._open(content_hash) or self._extract(content_hash, path)
+                with self._lock:
+                    self._documents[content_hash] = document
+                    self._locks.pop(content_hash, None)
+                    while len(self._documents) > DOCUMENT_MEMO_SIZE:
+                        self._documents.popitem(last=False)
+
+        return document
+
+    def _directory(self, content_hash: str) -> str:
+        return os.path.join(self.root, content_hash)
+
+    def _open(self, content_hash: str):
+        directory = self._directory(content_hash)
+        index_path = os.path.join(directory, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != STORE_VERSION:
+            shutil.rmtree(directory, ignore_errors=True)
+            return None
+        return ExtractedDocument(content_hash, directory, [tuple(o) for o in index["offsets"]])
+
+    def _extract(self, content_hash: str, path: str) -> ExtractedDocument:
+        ## Imported lazily; only needed the first time a document is seen
+        from extraction import extraction_pool
+
+        directory = self._directory(content_hash)
+        staging = f"{directory}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(staging, exist_ok=True)
+
+        try:
+            ## Large PDFs are parsed page-parallel in worker processes
+            offsets = extraction_pool.extract(path, os.path.join(staging, TEXT_FILE))
+
+            with open(os.path.join(staging, INDEX_FILE), "w", encoding="utf-8") as f:
+                json.dump({"version": STORE_VERSION, "content_hash": content_hash, "offsets": offsets}, f)
+
+            ## Publish atomically; another process may have won the race
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        return ExtractedDocument(content_hash, directory, offsets)
+
+
+def _file_signature(path: str):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+document_store = DocumentStore()
@@ -0,0 +1,205 @@
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from normalize import collapse_whitespace
+
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+## PDF text extraction is pure Python and holds the GIL, so large documents are
+## split into page ranges and parsed in worker processes. Workers write their
+## pages to part files next to the output and return only byte lengths; the
+## text itself is never pickled.
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
+## Seconds one document may spend being parsed before it is abandoned. In the
+## worker pool the document's stuck ranges are cut off; in-process parsing
+## checks the deadline between pages, so it may overrun by one page
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "300"))
+
+## Smaller documents are parsed in-process; spinning up ranges isn't worth it
+EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("EXTRACT_PARALLEL_MIN_PAGES", "32"))
+
+## Pages per range; small enough to balance work, large enough to amortize
+## re-opening the PDF in each worker
+EXTRACT_MIN_RANGE_PAGES = int(os.getenv("EXTRACT_MIN_RANGE_PAGES", "8"))
+
+
+class ExtractionTimeout(TimeoutError):
+    pass
+
+
+# ── Worker ───────────────────────────────────────────────────────────────────
+
+def extract_range(path: str, first: int, last: int, out_path: str, deadline: float = None) -> list:
+    """
+    Writes the normalized text of pages first..last (0-based, inclusive) to
+    out_path, one page after another, and returns the byte length of each.
+    Runs in worker processes, so it opens the PDF itself. With a deadline
+    (time.monotonic()), gives up between pages once it has passed.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    lengths = []
+    with open(out_path, "wb") as out:
+        for number in range(first, last + 1):
+            if deadline is not None and time.monotonic() > deadline:
+                raise ExtractionTimeout(f"Extracting {last - first + 1} pages took longer than the deadline")
+            encoded = (collapse_whitespace(reader.pages[number].extract_text() or "") + "\n").encode("utf-8")
+            out.write(encoded)
+            lengths.append(len(encoded))
+    return lengths
+
+
+def page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def page_ranges(pages: int, workers: int) -> list:
+    """Splits pages into ~4 ranges per worker so a slow range doesn't leave cores idle."""
+    size = max(EXTRACT_MIN_RANGE_PAGES, math.ceil(pages / (workers * 4)))
+    return [(first, min(first + size, pages) - 1) for first in range(0, pages, size)]
+
+
+# ── Extraction Pool ──────────────────────────────────────────────────────────
+
+class ExtractionPool:
+    """
+    Process pool shared by every extraction in the API process. Created on
+    first use, so startup and small documents never pay for it.
+    """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS, timeout: float = EXTRACT_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def extract(self, path: str, out_path: str) -> list:
+        """
+        Writes the text of every page of the PDF at path to out_path and
+        returns each page's (start, end) byte offsets in it.
+        """
+        pages = page_count(path)
+        deadline = time.monotonic() + self.timeout
+
+        if self.workers == 1 or pages < EXTRACT_PARALLEL_MIN_PAGES:
+            lengths = extract_range(path, 0, pages - 1, out_path, deadline) if pages else []
+        else:
+            try:
+                lengths = self._extract_parallel(path, pages, out_path, deadline)
+            except BrokenProcessPool:
+                ## A worker died (e.g. OOM-killed on a pathological page): start a
+                ## fresh pool for the next document, parse this one in-process
+                logger.warning("Extraction worker crashed on %s, retrying in-process", path)
+                lengths = extract_range(path, 0, pages - 1, out_path, deadline)
+
+        offsets = []
+        position = 0
+        for length in lengths:
+            offsets.append((position, position + length))
+            position += length
+        return offsets
+
+    def _extract_parallel(self, path: str, pages: int, out_path: str, deadline: float) -> list:
+        ranges = page_ranges(pages, self.workers)
+        parts = [f"{out_path}.part{i}" for i in range(len(ranges))]
+        pool = self._executor()
+
+        ## Ranges check the deadline between pages; only a range stuck inside a
+        ## single page has to be cut off by retiring the pool
+        futures = []
+        try:
+            try:
+                for (first, last), part in zip(ranges, parts):
+                    futures.append(pool.submit(extract_range, path, first, last, part, deadline))
+            except BrokenProcessPool:
+                self._retire(pool)
+                raise
+
+            lengths = []
+            for future in futures:
+                remaining = deadline - time.monotonic()
+                try:
+                    lengths.extend(future.result(timeout=max(remaining, 0)))
+                except BrokenProcessPool:
+                    self._retire(pool)
+                    raise
+                except FutureTimeout:
+                    for pending in futures:
+                        pending.cancel()
+                    if not all(f.done() for f in futures):
+                        self._retire(pool, kill_after=self.timeout)
+                    raise ExtractionTimeout(f"Extracting {pages} pages took longer than {self.timeout:g}s")
+
+            ## Stitch the parts together in page order
+            with open(out_path, "wb") as out:
+                for part in parts:
+                    with open(part, "rb") as f:
+                        shutil.copyfileobj(f, out, 1024 * 1024)
+            return lengths
+
+        finally:
+            for future in futures:
+                future.cancel()
+            for part in parts:
+                try:
+                    os.remove(part)
+                except OSError:
+                    pass
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                ## The API process runs many threads; forking it could copy held locks
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._pool
+
+    def _retire(self, pool: ProcessPoolExecutor, kill_after: float = None):
+        """
+        Sends new documents to a fresh pool while the old one finishes the
+        ranges other documents already queued on it. Worker processes can't
+        be interrupted one task at a time, so with kill_after, whatever is
+        still running that many seconds later is terminated; every other
+        document's own deadline has passed by then.
+        """
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        pool.shutdown(wait=False)
+
+        if kill_after is not None:
+            processes = list((pool._processes or {}).values())
+
+            def terminate():
+                for process in processes:
+                    if process.is_alive():
+                        process.terminate()
+
+            timer = threading.Timer(kill_after, terminate)
+            timer.daemon = True
+            timer.start()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+extraction_pool = ExtractionPool()
@@ -0,0 +1,289 @@
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from chunking import iter_sections
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+METRICS_FILE = "metrics.json"
+
+## Bump when line-item matching or ratio definitions change
+METRICS_VERSION = 3
+
+## Filings show at most three comparative periods side by side
+MAX_PERIODS = 3
+
+METRICS_MEMO_SIZE = 64
+
+
+# ── Line Items ───────────────────────────────────────────────────────────────
+## Canonical statement rows and the label patterns that identify them. A row
+## inside one of the primary statements wins over rows elsewhere (MD&A and
+## segment tables repeat and break down the same figures); within each, the
+## first matching row in the document wins.
+
+LINE_ITEMS = OrderedDict([
+    ("revenue", r"^(total\s+)?(net\s+)?(revenues?|sales)$|^total\s+net\s+(revenues?|sales)$"),
+    ("cost_of_revenue", r"^(total\s+)?cost\s+of\s+(revenues?|sales|goods\s+sold)$"),
+    ("gross_profit", r"^gross\s+(profit|margin)$"),
+    ("operating_income", r"^(total\s+)?(operating\s+income(\s+\(loss\))?|income(\s+\(loss\))?\s+from\s+operations)$"),
+    ("interest_expense", r"^interest\s+expense(,\s*net)?$"),
+    ("net_income", r"^net\s+(income|earnings|loss|income\s+\(loss\))(\s+attributable\s+to\s+.*)?$"),
+    ("cash", r"^(total\s+)?cash\s+and\s+cash\s+equivalents$"),
+    ("current_assets", r"^total\s+current\s+assets$"),
+    ("total_assets", r"^total\s+assets$"),
+    ("current_liabilities", r"^total\s+current\s+liabilities$"),
+    ("total_liabilities", r"^total\s+liabilities$"),
+    ("long_term_debt", r"^long[-\s]term\s+debt(,\s*net\s+of\s+current\s+portion|,\s*net)?$"),
+    ("total_equity", r"^total\s+(stockholders|shareholders)['’]?\s+equity$|^total\s+equity$"),
+    ("operating_cash_flow", r"^net\s+cash\s+(provided\s+by|from|\(used\s+in\)\s+provided\s+by|provided\s+by\s+\(used\s+in\))\s+operating\s+activities$"),
+    ("capital_expenditures", r"^(capital\s+expenditures|purchases?\s+of\s+property(,)?\s+(plant\s+)?and\s+equipment.*)$"),
+])
+
+_LINE_ITEM_PATTERNS = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in LINE_ITEMS.items()]
+
+## A numeric cell: optional $, thousands separators, decimals, parentheses for negatives
+_NUMBER = re.compile(r"\(?-?\$?\s?\d[\d,]*(?:\.\d+)?\)?|(?<!\w)[—–-](?!\w)")
+_YEAR = re.compile(r"^(19|20)\d{2}$")
+_SCALE = re.compile(r"in\s+(thousands|millions|billions)", re.IGNORECASE)
+
+## chunking section titles of the primary statements
+STATEMENT_SECTIONS = {"Income Statement", "Balance Sheet", "Cash Flow Statement"}
+
+
+# ── Table Row Extraction ─────────────────────────────────────────────────────
+
+def iter_table_rows(pages):
+    """
+    Yields (label, [raw cells], in_statement) for every line that looks like
+    a statement row: a text label followed only by numeric cells.
+    in_statement is True inside a primary statement section.
+    """
+    for title, lines in iter_sections(pages):
+        in_statement = title in STATEMENT_SECTIONS
+        for _, line in lines:
+            line = line.rstrip("\r\n")
+            first = _NUMBER.search(line)
+            if first is None or first.start() == 0:
+                continue
+
+            label = line[:first.start()].strip(" .:$\t")
+            if not label or not any(c.isalpha() for c in label):
+                continue
+
+            cells = _NUMBER.findall(line[first.start():])
+            rest = _NUMBER.sub("", line[first.start():]).strip(" $%\t")
+            if rest:
+                continue
+
+            yield label, cells[:MAX_PERIODS], in_statement
+
+
+def detect_periods(pages) -> list:
+    """
+    Returns the first header row of fiscal years found, in column order.
+    Quarterly reports repeat the years for each column group (three months,
+    then year to date: 2024 2023 2024 2023), so only the first group of
+    distinct years is kept.
+    """
+    for _, text in pages:
+        for line in text.splitlines():
+            tokens = line.split()
+            if len(tokens) >= 2 and all(_YEAR.match(t) for t in tokens):
+                periods = []
+                for token in tokens:
+                    if token in periods:
+                        break
+                    periods.append(token)
+                return periods[:MAX_PERIODS]
+    return []
+
+
+def detect_scale(pages) -> str:
+    for _, text in pages:
+        match = _SCALE.search(text)
+        if match:
+            return match.group(1).lower()
+    return "units"
+
+
+def parse_cells(cells: pd.Series) -> pd.Series:
+    """Vectorized conversion of raw cells like '$(1,234.5)' or '—' to floats."""
+    cleaned = cells.str.replace(r"[\s$,]", "", regex=True)
+    negative = cleaned.str.startswith("(") | cleaned.str.startswith("-")
+    cleaned = cleaned.str.strip("()-").replace({"—": "0", "–": "0", "": "0"})
+    values = pd.to_numeric(cleaned, errors="coerce")
+    return values.where(~negative, -values)
+
+
+def extract_line_items(pages, periods: list) -> pd.DataFrame:
+    """
+    Builds a DataFrame of canonical line items (rows) by period (columns)
+    from the document's statement tables. `periods` are in the document's
+    column order; the result's columns are sorted most recent first.
+    """
+    columns = periods or [f"P{i}" for i in range(MAX_PERIODS)]
+    latest_first = sorted(periods, reverse=True) or columns
+    found = {}
+
+    for label, cells, in_statement in iter_table_rows(pages):
+        for name, pattern in _LINE_ITEM_PATTERNS:
+            if pattern.match(label):
+                if name not in found or (in_statement and not found[name][0]):
+                    found[name] = (in_statement, cells)
+                break
+        if len(found) == len(_LINE_ITEM_PATTERNS) and all(primary for primary, _ in found.values()):
+            break
+
+    records = [
+        (name, columns[position], cell)
+        for name, (_, cells) in found.items()
+        for position, cell in enumerate(cells[:len(columns)])
+    ]
+    if not records:
+        return pd.DataFrame(index=pd.Index(list(LINE_ITEMS), name="item"), columns=latest_first, dtype=float)
+
+    frame = pd.DataFrame(records, columns=["item", "period", "cell"])
+    frame["value"] = parse_cells(frame["cell"])
+
+    table = frame.pivot(index="item", columns="period", values="value")
+    return table.reindex(index=list(LINE_ITEMS), columns=latest_first).astype(float)
+
+
+# ── Ratios ───────────────────────────────────────────────────────────────────
+
+def compute_ratios(items: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes standard ratios for every period at once. Each ratio is a
+    whole-row vector operation, so this works equally on one document's
+    periods or on many documents' periods concatenated column-wise.
+    """
+    def row(name):
+        return items.loc[name] if name in items.index else pd.Series(np.nan, index=items.columns)
+
+    def safe_divide(numerator, denominator):
+        return numerator / denominator.where(denominator != 0)
+
+    revenue = row("revenue")
+    gross_profit = row("gross_profit").fillna(revenue - row("cost_of_revenue"))
+    equity = row("total_equity")
+    capex = row("capital_expenditures").abs()
+    free_cash_flow = row("operating_cash_flow") - capex.fillna(0)
+
+    ratios = pd.DataFrame({
+        "gross_margin": safe_divide(gross_profit, revenue),
+        "operating_margin": safe_divide(row("operating_income"), revenue),
+        "net_margin": safe_divide(row("net_income"), revenue),
+        "return_on_assets": safe_divide(row("net_income"), row("total_assets")),
+        "return_on_equity": safe_divide(row("net_income"), equity),
+        "current_ratio": safe_divide(row("current_assets"), row("current_liabilities")),
+        "cash_ratio": safe_divide(row("cash"), row("current_liabilities")),
+        "debt_to_equity": safe_divide(row("long_term_debt"), equity),
+        "liabilities_to_equity": safe_divide(row("total_liabilities"), equity),
+        "liabilities_to_assets": safe_divide(row("total_liabilities"), row("total_assets")),
+        "interest_coverage": safe_divide(row("operating_income"), row("interest_expense").abs()),
+        "free_cash_flow": free_cash_flow,
+        "fcf_margin": safe_divide(free_cash_flow, revenue),
+    }).T
+
+    return ratios
+
+
+def year_over_year(table: pd.DataFrame) -> pd.Series:
+    """Change from the prior period to the latest one, for every row at once."""
+    if table.shape[1] < 2:
+        return pd.Series(np.nan, index=table.index)
+
+    latest, prior = table.iloc[:, 0], table.iloc[:, 1]
+    return (latest - prior) / prior.abs().where(prior != 0)
+
+
+# ── Financial Metrics ────────────────────────────────────────────────────────
+
+class FinancialMetrics:
+    def __init__(self, periods: list, scale: str, line_items: pd.DataFrame, ratios: pd.DataFrame):
+        self.periods = periods
+        self.scale = scale
+        self.line_items = line_items
+        self.ratios = ratios
+        self.line_item_changes = year_over_year(line_items)
+        self.ratio_changes = year_over_year(ratios)
+
+    @classmethod
+    def from_pages(cls, pages):
+        pages = list(pages)
+        periods = detect_periods(pages)
+        line_items = extract_line_items(pages, periods)
+        return cls(sorted(periods, reverse=True), detect_scale(pages), line_items, compute_ratios(line_items))
+
+    def latest(self, name: str):
+        table = self.ratios if name in self.ratios.index else self.line_items
+        if name not in table.index or table.shape[1] == 0:
+            return None
+        value = table.loc[name].iloc[0]
+        return None if pd.isna(value) else float(value)
+
+    def to_dict(self) -> dict:
+        return {
+            "version": METRICS_VERSION,
+            "periods": self.periods,
+            "scale": self.scale,
+            "line_items": json.loads(self.line_items.to_json(orient="split")),
+            "ratios": json.loads(self.ratios.to_json(orient="split")),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        def frame(split):
+            return pd.DataFrame(split["data"], index=split["index"], columns=split["columns"], dtype=float)
+
+        return cls(data["periods"], data["scale"], frame(data["line_items"]), frame(data["ratios"]))
+
+
+# ── Metrics Store ────────────────────────────────────────────────────────────
+
+_metrics = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_financial_metrics(document) -> FinancialMetrics:
+    """
+    Returns the metrics for an ExtractedDocument, computing them once and
+    persisting them next to the parsed text for later requests.
+    """
+    with _lock:
+        metrics = _metrics.get(document.content_hash)
+        if metrics is not None:
+            _metrics.move_to_end(document.content_hash)
+            return metrics
+
+    path = os.path.join(document.directory, METRICS_FILE)
+    metrics = None
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == METRICS_VERSION:
+            metrics = FinancialMetrics.from_dict(data)
+
+    if metrics is None:
+        metrics = FinancialMetrics.from_pages(document.pages())
+        ## Renamed into place so a concurrent reader never loads a partial file
+        staging = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(staging, "w", encoding="utf-8") as f:
+            json.dump(metrics.to_dict(), f)
+        os.replace(staging, path)
+
+    with _lock:
+        _metrics[document.content_hash] = metrics
+        while len(_metrics) > METRICS_MEMO_SIZE:
+            _metrics.popitem(last=False)
+
+    return metrics
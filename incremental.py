@@ -0,0 +1,252 @@
+import bisect
+import hashlib
+import os
+import re
+from collections import namedtuple
+
+from chunking import Chunk, iter_sections, CHUNK_MAX_TOKENS, CHARS_PER_TOKEN
+from models import AnalysisResult, SectionFingerprint
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+## Incremental analysis: every stored result keeps its issuer and a hash of
+## each paragraph of the document, per section. When the same issuer's next
+## filing arrives, only paragraphs whose hash the earlier filing doesn't have
+## are sent to the agents, together with the earlier report.
+
+## The text has no blank lines left to find paragraphs by, so "paragraphs" are
+## runs of a few sentences (or statement rows) with content-defined ends: a
+## run ends after a sentence whose own hash picks it, not at a fixed size or a
+## page break. An inserted sentence or a reflowed page then changes only the
+## paragraph it lands in, not every later one.
+
+## Paragraphs shorter than this (page numbers, running headers) are ignored,
+## and shorter ones are never cut early
+MIN_PARAGRAPH_CHARS = int(os.getenv("INCREMENTAL_MIN_PARAGRAPH_CHARS", "40"))
+
+## A paragraph ends after roughly one sentence or row in this many
+BOUNDARY_EVERY = 8
+
+## Paragraphs are cut here regardless, so a long table without a boundary
+## row doesn't make one huge paragraph
+MAX_PARAGRAPH_CHARS = 2000
+
+## Lines of the first page searched for the registrant's name
+COVER_LINES = 60
+
+
+Paragraph = namedtuple("Paragraph", "digest page text")
+Section = namedtuple("Section", "title start_page end_page paragraphs")
+BaseAnalysis = namedtuple("BaseAnalysis", "result_id query analysis digests")
+
+
+# ── Issuer Detection ─────────────────────────────────────────────────────────
+
+_REGISTRANT = re.compile(r"^\s*(.+?)\s*\n\s*\(exact name of registrant", re.IGNORECASE | re.MULTILINE)
+_COMPANY_LINE = re.compile(
+    r"^\s*([A-Z][\w&.,'’ -]{1,80}?\b(?:Inc|Incorporated|Corp|Corporation|Company|Co|Ltd|Limited|plc|PLC|"
+    r"LLC|L\.P|N\.V|S\.A|AG|SE|Holdings|Group)\.?)\s*$",
+    re.MULTILINE,
+)
+_RELEASE_HEADLINE = re.compile(r"^\s*(.+?)\s+(?:reports|announces)\b", re.IGNORECASE | re.MULTILINE)
+
+_LEGAL_SUFFIXES = frozenset(
+    "inc incorporated corp corporation company co ltd limited plc llc lp nv sa ag se the".split()
+)
+
+
+def issuer_key(name: str) -> str:
+    """'The Acme Holdings, Inc.' -> 'acme holdings'."""
+    words = re.sub(r"[^\w\s]", " ", name.lower()).split()
+    while words and words[-1] in _LEGAL_SUFFIXES:
+        words.pop()
+    while words and words[0] == "the":
+        words.pop(0)
+    return " ".join(words) or None
+
+
+def detect_issuer(cover: str) -> str:
+    """The registrant's name from the cover page of a filing or the headline of a release."""
+    cover = "\n".join(cover.splitlines()[:COVER_LINES])
+    for pattern in (_REGISTRANT, _COMPANY_LINE, _RELEASE_HEADLINE):
+        match = pattern.search(cover)
+        if match and issuer_key(match.group(1)):
+            return match.group(1).strip(" ,")
+    return None
+
+
+# ── Fingerprints ─────────────────────────────────────────────────────────────
+
+def _digest(text: str) -> str:
+    ## Whitespace and case differences don't count as changes; figures do
+    return hashlib.sha1(" ".join(text.split()).lower().encode("utf-8")).hexdigest()[:16]
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?:;])[\"”’)]*\s+")
+_TABLE_ROW = re.compile(r"\d[\d,.]*\)?%?\s*$|\s[—–-]\s*$")
+_PAGE_MARKER = re.compile(r"^\W*(?:page\s+)?\d+(?:\s+of\s+\d+)?\W*$", re.IGNORECASE)
+
+
+def _pieces(lines: list):
+    """
+    Yields (page, text) per sentence of prose and per statement row. Prose
+    lines are joined first, so where a line or page happens to wrap doesn't
+    matter; each sentence keeps the page it starts on. Page numbers are dropped.
+    """
+    prose, offsets, pages = [], [], []
+
+    def sentences():
+        text = " ".join(prose)
+        start = 0
+        for separator in [*_SENTENCE_END.finditer(text), None]:
+            end = separator.start() if separator else len(text)
+            sentence = text[start:end]
+            if sentence.strip():
+                ## The page of the line the sentence's first character came from
+                first = start + len(sentence) - len(sentence.lstrip())
+                yield pages[bisect.bisect_right(offsets, first) - 1], sentence.strip()
+            if separator:
+                start = separator.end()
+
+    for number, line in lines:
+        line = line.strip()
+        if not line or _PAGE_MARKER.match(line):
+            continue
+        if _TABLE_ROW.search(line):
+            yield from sentences()
+            prose, offsets, pages = [], [], []
+            yield number, line
+        else:
+            ## Offset of this line in the joined text (lines are joined with one space)
+            offsets.append(offsets[-1] + len(prose[-1]) + 1 if prose else 0)
+            pages.append(number)
+            prose.append(line)
+    yield from sentences()
+
+
+def _paragraphs(lines: list):
+    """Groups sentences and rows into paragraphs, cutting after content-chosen boundaries and at MAX_PARAGRAPH_CHARS."""
+    page, unit, size = None, [], 0
+    for number, piece in _pieces(lines):
+        if unit and size + len(piece) > MAX_PARAGRAPH_CHARS:
+            yield page, "\n".join(unit)
+            unit, size = [], 0
+        if not unit:
+            page = number
+        unit.append(piece)
+        size += len(piece) + 1
+        if size >= MIN_PARAGRAPH_CHARS and int(_digest(piece), 16) % BOUNDARY_EVERY == 0:
+            yield page, "\n".join(unit)
+            unit, size = [], 0
+    if unit:
+        yield page, "\n".join(unit)
+
+
+class DocumentProfile:
+    """The issuer and per-section paragraph fingerprints of one parsed document."""
+
+    def __init__(self, issuer: str, sections: list):
+        self.issuer = issuer
+        self.issuer_key = issuer_key(issuer) if issuer else None
+        self.sections = sections
+
+    @classmethod
+    def from_document(cls, document):
+        sections = []
+        for title, lines in iter_sections(document.pages()):
+            paragraphs = [
+                Paragraph(_digest(text), page, text)
+                for page, text in _paragraphs(lines)
+                if len(text.strip()) >= MIN_PARAGRAPH_CHARS
+            ]
+            if paragraphs:
+                sections.append(Section(title, lines[0][0], lines[-1][0], paragraphs))
+
+        issuer = detect_issuer(document.text(1, 1)) if document.page_count else None
+        return cls(issuer, sections)
+
+    def fingerprint_rows(self) -> list:
+        return [
+            SectionFingerprint(
+                position=position,
+                section=section.title,
+                start_page=section.start_page,
+                end_page=section.end_page,
+                paragraphs=" ".join(p.digest for p in section.paragraphs),
+            )
+            for position, section in enumerate(self.sections)
+        ]
+
+    def changes(self, base: BaseAnalysis):
+        """
+        Returns (changed sections, removed section titles). A changed section
+        keeps only the paragraphs the base document doesn't contain anywhere,
+        so passages that merely moved between sections don't count.
+        """
+        changed = []
+        for section in self.sections:
+            paragraphs = [p for p in section.paragraphs if p.digest not in base.digests["*"]]
+            if paragraphs:
+                changed.append(section._replace(paragraphs=paragraphs))
+
+        titles = {section.title for section in self.sections}
+        removed = [title for title in base.digests if title != "*" and title not in titles]
+        return changed, removed
+
+    def token_count(self) -> int:
+        return sum(len(p.text) for s in self.sections for p in s.paragraphs) // CHARS_PER_TOKEN + 1
+
+
+def change_chunks(changed: list, max_tokens: int = CHUNK_MAX_TOKENS) -> list:
+    """Packs changed paragraphs into Chunks of at most max_tokens, each labelled with its section and pages."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks, titles, parts, pages, size = [], [], [], [], 0
+
+    def build():
+        return Chunk(len(chunks), "; ".join(titles), min(pages), max(pages), "\n".join(parts))
+
+    for section in changed:
+        for paragraph in section.paragraphs:
+            text = f"[{section.title}, page {paragraph.page}]\n{paragraph.text.strip()}\n"
+            if parts and size + len(text) > max_chars:
+                chunks.append(build())
+                titles, parts, pages, size = [], [], [], 0
+            if section.title not in titles:
+                titles.append(section.title)
+            parts.append(text[:max_chars])
+            pages.append(paragraph.page)
+            size += len(text)
+
+    if parts:
+        chunks.append(build())
+    return chunks
+
+
+# ── Base Analysis ────────────────────────────────────────────────────────────
+
+def load_base(db, issuer: str) -> BaseAnalysis:
+    """
+    The most recent stored analysis of the same issuer that has fingerprints,
+    whatever its query, so changes are always measured against the latest
+    filing. None if the issuer is new.
+    """
+    if not issuer:
+        return None
+
+    record = (
+        db.query(AnalysisResult)
+        .filter(AnalysisResult.issuer == issuer, AnalysisResult.fingerprints.any())
+        .order_by(AnalysisResult.id.desc())
+        .first()
+    )
+    if record is None:
+        return None
+
+    ## "*" holds every paragraph of the document, for matching moved passages
+    digests = {"*": set()}
+    for row in record.fingerprints:
+        hashes = row.paragraphs.split()
+        digests.setdefault(row.section, set()).update(hashes)
+        digests["*"].update(hashes)
+
+    return BaseAnalysis(record.id, record.query, record.analysis, digests)
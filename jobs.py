@@ -0,0 +1,157 @@
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+## Worker threads run the blocking CrewAI kickoffs off the event loop.
+## Threads (not processes) are used because Crew, Agent and LLM client objects
+## are not picklable, and the crews spend almost all their time waiting on I/O.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "30"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLING = "cancelling"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """Raised when every worker is busy and the pending queue is full."""
+
+
+# ── Job ──────────────────────────────────────────────────────────────────────
+
+class Job:
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.on_cancel = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# ── Job Queue ────────────────────────────────────────────────────────────────
+
+class JobQueue:
+    """
+    Bounded worker pool. At most `workers` jobs run at once and at most
+    `max_pending` more wait for a free worker; beyond that submit() raises
+    QueueFull so the API can answer 429 instead of piling up work.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_QUEUE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crew-worker")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, on_cancel=None, **kwargs) -> Job:
+        """
+        Queues fn(*args, **kwargs). on_cancel runs if the job is cancelled
+        before it starts, since fn (and any cleanup it does) never runs then.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull()
+
+        job = Job()
+        job.on_cancel = on_cancel
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+
+        job.future = self._executor.submit(self._execute, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        """
+        Cancels a queued job outright. A running crew cannot be interrupted,
+        so it is marked as cancelling and its result is discarded on completion.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+
+            cancelled = job.future.cancel()
+            if cancelled:
+                job.status = CANCELLED
+                job.finished_at = datetime.utcnow()
+                self._slots.release()
+            else:
+                job.status = CANCELLING
+
+        if cancelled and job.on_cancel is not None:
+            job.on_cancel()
+        return job
+
+    def depth(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def _execute(self, job: Job, fn, args, kwargs):
+        try:
+            with self._lock:
+                job.status = RUNNING
+                job.started_at = datetime.utcnow()
+
+            result = fn(*args, **kwargs)
+
+            with self._lock:
+                if job.status == CANCELLING:
+                    job.status = CANCELLED
+                else:
+                    job.result = result
+                    job.status = COMPLETED
+
+        except Exception as e:
+            with self._lock:
+                job.error = str(e)
+                job.status = CANCELLED if job.status == CANCELLING else FAILED
+
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._slots.release()
+
+    def _prune(self):
+        ## Finished jobs are kept for polling, then dropped to bound memory
+        now = datetime.utcnow()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in FINISHED_STATES
+            and job.finished_at is not None
+            and (now - job.finished_at).total_seconds() > JOB_RETENTION_SECONDS
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_queue = JobQueue()
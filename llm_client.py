@@ -0,0 +1,117 @@
+import copy
+import logging
+import os
+import threading
+
+import httpx
+import litellm
+from crewai import LLM
+
+from chunking import estimate_tokens
+from llm_memo import llm_memo
+from progress import emit_token, streaming_tokens
+from ratelimit import llm_scheduler
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+# ── Shared HTTP Client ───────────────────────────────────────────────────────
+## litellm uses litellm.client_session for every OpenAI-compatible request, so
+## setting it once gives all agents one keep-alive connection pool instead of
+## a TLS handshake per call.
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+_client_lock = threading.Lock()
+
+
+def shared_http_client() -> httpx.Client:
+    with _client_lock:
+        if litellm.client_session is None:
+            litellm.client_session = httpx.Client(
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
+            )
+        return litellm.client_session
+
+
+# ── Token Streaming ──────────────────────────────────────────────────────────
+## With stream=True crewai emits an LLMStreamChunkEvent per chunk on its event
+## bus, synchronously in the calling thread, so the handler sees the job's
+## progress channel through its context.
+
+_stream_listener = None
+
+
+def _register_stream_listener():
+    global _stream_listener
+    with _client_lock:
+        if _stream_listener is not None:
+            return
+        try:
+            from crewai.utilities.events import crewai_event_bus, LLMStreamChunkEvent
+        except ImportError:
+            logger.warning("crewai event bus unavailable; streaming only task-level progress")
+            _stream_listener = False
+            return
+
+        @crewai_event_bus.on(LLMStreamChunkEvent)
+        def forward_chunk(source, event):
+            emit_token(event.chunk)
+
+        _stream_listener = forward_chunk
+
+
+# ── Scheduled LLM ────────────────────────────────────────────────────────────
+
+def message_tokens(messages) -> int:
+    if isinstance(messages, str):
+        return estimate_tokens(messages)
+    return sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+
+
+class ScheduledLLM(LLM):
+    """
+    crewai LLM whose calls are first looked up in the persistent response
+    memo, and otherwise go through the process-wide rate limit scheduler.
+    Retries happen here, with the scheduler's jittered backoff, rather than
+    inside each agent.
+    """
+
+    def __init__(self, *args, **kwargs):
+        shared_http_client()
+        _register_stream_listener()
+        kwargs.setdefault("base_url", LLM_BASE_URL)
+        kwargs.setdefault("timeout", LLM_TIMEOUT)
+        super().__init__(*args, **kwargs)
+
+    def call(self, messages, *args, **kwargs):
+        ## The instance is shared by every job, so streaming requests use a
+        ## shallow copy with stream enabled instead of flipping the shared flag
+        target = self
+        if streaming_tokens() and not getattr(self, "stream", False):
+            target = copy.copy(self)
+            target.stream = True
+
+        def scheduled():
+            ## Includes time spent waiting for the rate limiter and on retries
+            with span("llm_call", model=self.model):
+                return llm_scheduler.call(
+                    lambda: LLM.call(target, messages, *args, **kwargs),
+                    tokens=message_tokens(messages),
+                    completion_tokens=lambda response: estimate_tokens(str(response or "")),
+                )
+
+        ## Native function calling executes tools inside call(); never replay those
+        ## (positional order: tools, callbacks, available_functions)
+        tools = kwargs.get("tools", args[0] if args else None)
+        functions = kwargs.get("available_functions", args[2] if len(args) > 2 else None)
+        if tools or functions:
+            return scheduled()
+        return llm_memo.cached_call(self, messages, scheduled)
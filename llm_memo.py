@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from compression import compress, decompress, DEFAULT_CODEC
+
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+## The specialists of one document send many near-identical prompts, and a
+## replayed batch repeats every one of them. Responses are memoized on disk,
+## keyed by model + normalized messages + sampling parameters, so a replay or
+## retry is answered locally without spending any of the provider quota.
+
+LLM_MEMO_ENABLED = os.getenv("LLM_MEMO_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_MEMO_PATH = os.getenv("LLM_MEMO_PATH", "data/llm_memo.db")
+LLM_MEMO_MAX_BYTES = int(os.getenv("LLM_MEMO_MAX_BYTES", str(256 * 1024 * 1024)))
+
+## Bump when the key derivation changes
+MEMO_VERSION = "2"
+
+## LLM attributes that change the response and therefore belong in the key
+KEY_PARAMS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens",
+    "presence_penalty", "frequency_penalty", "logit_bias", "seed",
+    "response_format", "reasoning_effort",
+)
+
+## Per-request policy: (read, write). Set from the request's Cache-Control.
+_policy = ContextVar("llm_memo_policy", default=(True, True))
+
+
+@contextmanager
+def memo_policy(read: bool = True, write: bool = True):
+    """Controls whether the enclosed LLM calls may read and/or fill the memo."""
+    token = _policy.set((read, write))
+    try:
+        yield
+    finally:
+        _policy.reset(token)
+
+
+# ── Memo Keys ────────────────────────────────────────────────────────────────
+## Every upload is stored under a fresh random name that the prompts mention
+## ("The document is located at: ..."). The name is replaced by a placeholder
+## in keys and in stored responses, and a replayed response gets the current
+## request's name back, so re-uploads and replays still hit the memo.
+
+_UPLOAD_NAME = re.compile(r"financial_document_[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}\.pdf")
+UPLOAD_PLACEHOLDER = "financial_document_{upload}.pdf"
+
+
+def _as_list(messages) -> list:
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    return messages
+
+
+def normalize_messages(messages) -> list:
+    """Role + whitespace-collapsed content; formatting-only and upload-name differences share a key."""
+    normalized = []
+    for m in _as_list(messages):
+        content = " ".join(str(m.get("content") or "").split())
+        normalized.append([m.get("role", "user"), _UPLOAD_NAME.sub(UPLOAD_PLACEHOLDER, content)])
+    return normalized
+
+
+def upload_name(messages) -> str:
+    """The first upload file name the messages mention, if any."""
+    for m in _as_list(messages):
+        match = _UPLOAD_NAME.search(str(m.get("content") or ""))
+        if match:
+            return match.group(0)
+    return None
+
+
+def memo_key(model: str, messages, params: dict) -> str:
+    material = json.dumps(
+        [MEMO_VERSION, model, normalize_messages(messages), params],
+        sort_keys=True, default=str, separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def llm_params(llm) -> dict:
+    params = {}
+    for name in KEY_PARAMS:
+        value = getattr(llm, name, None)
+        if value is not None:
+            ## Structured output models are keyed by name and schema
+            if isinstance(value, type):
+                schema = getattr(value, "model_json_schema", None) or getattr(value, "schema", None)
+                value = [value.__name__, schema() if schema else None]
+            params[name] = value
+    return params
+
+
+# ── Memo Store ───────────────────────────────────────────────────────────────
+
+class LLMMemo:
+    """
+    SQLite-backed response memo with least-recently-used eviction once the
+    stored (compressed) responses exceed max_bytes. One connection is shared
+    behind a lock; the file lives outside the results database so it can be
+    deleted at any time.
+    """
+
+    def __init__(self, path: str = LLM_MEMO_PATH, max_bytes: int = LLM_MEMO_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_memo ("
+                " key TEXT PRIMARY KEY, codec TEXT NOT NULL, size INTEGER NOT NULL,"
+                " data BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_memo_accessed_at ON llm_memo (accessed_at)")
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_memo").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT codec, data FROM llm_memo WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE llm_memo SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+        return decompress(row[1], row[0])
+
+    def put(self, key: str, response: str):
+        data = compress(response, DEFAULT_CODEC)
+        if len(data) > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            previous = conn.execute("SELECT size FROM llm_memo WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_memo (key, codec, size, data, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, DEFAULT_CODEC, len(data), data, now, now),
+            )
+            self._bytes += len(data) - (previous[0] if previous else 0)
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        if self._bytes <= self.max_bytes:
+            return
+        ## Oldest-accessed first, until back under the bound
+        for key, size in conn.execute("SELECT key, size FROM llm_memo ORDER BY accessed_at").fetchall():
+            if self._bytes <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_memo WHERE key = ?", (key,))
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM llm_memo").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._bytes,
+            }
+
+    def cached_call(self, llm, messages, call):
+        """Returns the memoized response for this call, or runs call() and stores it."""
+        read, write = _policy.get()
+        if not LLM_MEMO_ENABLED or not (read or write):
+            return call()
+
+        key = memo_key(getattr(llm, "model", None), messages, llm_params(llm))
+        if read:
+            try:
+                response = self.get(key)
+            except sqlite3.Error:
+                logger.exception("LLM memo lookup failed")
+                response = None
+            if response is not None:
+                upload = upload_name(messages)
+                return response.replace(UPLOAD_PLACEHOLDER, upload) if upload else response
+
+        response = call()
+
+        ## Only plain text is memoized; tool-call results are not replayable
+        if write and isinstance(response, str) and response:
+            try:
+                self.put(key, _UPLOAD_NAME.sub(UPLOAD_PLACEHOLDER, response))
+            except sqlite3.Error:
+                logger.exception("LLM memo write failed")
+
+        return response
+
+
+llm_memo = LLMMemo()
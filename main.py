@@ -1,41 +1,200 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, Depends, File, UploadFile, Form, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import List
+import asyncio
+import json
 import os
+import tarfile
+import threading
+import time
 import uuid
+import zipfile
+
+# Streaming uploads and the shared document store
+from uploads import spool_upload, UploadTooLarge, MAX_UPLOAD_BYTES
+from docstore import document_store
+from extraction import extraction_pool
+
+# Batch analysis helpers
+from batch import expand_archive, is_archive, archive_suffix, TooManyFiles
+from batch import BATCH_MAX_FILES, BATCH_MAX_BYTES, BATCH_MAX_IN_FLIGHT, BATCH_RETRY_INTERVAL
+
+# Result cache and the persistent LLM response memo
+from cache import result_cache, result_cache_key, RESULT_CACHE_TTL
+from llm_memo import llm_memo, memo_policy
+
+# Background job queue
+from jobs import job_queue, QueueFull, JOB_RETRY_AFTER, COMPLETED
+
+# Stage spans, Prometheus metrics, OpenTelemetry and optional profiling
+from telemetry import metrics, span, profiled, setup_tracing, http_request_duration, Gauge
+from ratelimit import llm_scheduler
+
+# Progress events for /analyze/stream
+from progress import ProgressChannel, reporting_to, emit, sse_event, SSE_HEARTBEAT
+from progress import QUEUED, STAGE, RESULT, ERROR
+
+# Process-wide LLM rate limiting with interactive/batch priority lanes
+from ratelimit import llm_lane, INTERACTIVE, BATCH
 
 # Database imports
-from database import engine, SessionLocal, Base
-from models import AnalysisResult
+from database import engine, Base, get_db, session_scope, result_writer
+from models import AnalysisResult, AnalysisBlob
+from migrations import upgrade
+from result_search import create_search_index, backfill_search_index, search_available
+from result_search import match_expression, search_results
 
-# CrewAI imports
-from crewai import Crew, Process
-from agents import financial_analyst
-from task import financial_analysis_task
+# CrewAI workflow (agents, tasks and the LLM client are built on first use)
+from registry import registry
+from agents import MODEL_NAME
+from task import PROMPT_VERSION
+from pipeline import ingest, run_single_task, run_pipeline, run_map_reduce, merge_sections, TokenUsage
+from pipeline import pre_verify, rejection, REJECT, run_incremental
+from pipeline import ANALYSIS_MODES, STANDARD, PIPELINE, MAP_REDUCE, INCREMENTAL
+from incremental import DocumentProfile, load_base
 
-# Create DB tables automatically
+# Create DB tables automatically and bring older databases up to date
 Base.metadata.create_all(bind=engine)
+upgrade(engine)
+create_search_index(engine)
 
 app = FastAPI(title="Financial Document Analyzer")
 
+# Exports spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set
+setup_tracing(app)
+
+# Build agents, tasks and the LLM client in the background right after startup,
+# so the first analysis doesn't pay for it; off by default to keep cold starts cheap
+WARM_START = os.getenv("WARM_START", "false").lower() in ("1", "true", "yes")
+
+
+@app.on_event("startup")
+def warm_up_agents():
+    if WARM_START:
+        threading.Thread(target=registry.warm_up, name="warm-up", daemon=True).start()
+
+
+@app.on_event("startup")
+def index_stored_results():
+    # Results stored before full-text search existed are indexed in the background
+    threading.Thread(target=backfill_search_index, args=(engine,), name="search-backfill", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def flush_pending_writes():
+    # Persist any results still waiting in the write-behind queue
+    result_writer.flush(timeout=30)
+
+
+@app.on_event("shutdown")
+def stop_extraction_workers():
+    # Stop the PDF extraction worker processes, if any were started
+    extraction_pool.shutdown()
+
 
 # ─────────────────────────────────────────────────────────────
-# Run CrewAI workflow
+# Upload Size Guard
 # ─────────────────────────────────────────────────────────────
-def run_crew(query: str, file_path: str = "data/sample.pdf"):
-    financial_crew = Crew(
-        agents=[financial_analyst],
-        tasks=[financial_analysis_task],
-        process=Process.sequential,
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse declared oversized bodies before the multipart parser spools them;
+    # a batch carries many files, so it is held to its own total instead
+    content_length = request.headers.get("content-length")
+    if request.method == "POST" and content_length and content_length.isdigit():
+        limit = BATCH_MAX_BYTES if request.url.path == "/analyze/batch" else MAX_UPLOAD_BYTES
+        # Allow some headroom for multipart boundaries and form fields
+        if int(content_length) > limit + 64 * 1024:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds the maximum size of {limit} bytes"}
+            )
+
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Streaming responses are timed to their first byte
+    start = time.perf_counter()
+    response = await call_next(request)
+
+    route = request.scope.get("route")
+    http_request_duration.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code
     )
+    return response
 
-    result = financial_crew.kickoff({
+
+# ─────────────────────────────────────────────────────────────
+# Run CrewAI workflow
+# ─────────────────────────────────────────────────────────────
+def run_crew(query: str, file_path: str = "data/sample.pdf", usage: TokenUsage = None):
+    result = run_single_task("financial_analyst", "financial_analysis_task", {
         "query": query,
         "file_path": file_path
-    })
+    }, usage)
 
     return result
 
 
+# ─────────────────────────────────────────────────────────────
+# Upload Cleanup
+# ─────────────────────────────────────────────────────────────
+def _remove_upload(file_path: str):
+    if os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+        except:
+            pass
+
+
+# ─────────────────────────────────────────────────────────────
+# Cached Results
+# ─────────────────────────────────────────────────────────────
+def _load_stored_result(cache_key: str):
+    # Falls back to a recent identical analysis already persisted in the database
+    with session_scope() as db:
+        record = (
+            db.query(AnalysisResult)
+            .filter(AnalysisResult.cache_key == cache_key)
+            .filter(AnalysisResult.created_at >= datetime.utcnow() - timedelta(seconds=RESULT_CACHE_TTL))
+            .order_by(AnalysisResult.created_at.desc())
+            .first()
+        )
+
+        if record is None:
+            return None
+
+        return {
+            "status": "success",
+            "query": record.query,
+            "analysis": record.analysis,
+            "file_processed": record.filename
+        }
+
+
+def _validate_mode(mode: str):
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown mode '{mode}', expected one of: {', '.join(ANALYSIS_MODES)}"
+        )
+
+
+def _cache_directives(cache_control: str):
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    # no-cache: skip the lookup but refresh the cache; no-store: don't cache either
+    bypass = "no-cache" in directives or "no-store" in directives
+    store = "no-store" not in directives
+    return bypass, store
+
+
 # ─────────────────────────────────────────────────────────────
 # Health Check Endpoint
 # ─────────────────────────────────────────────────────────────
@@ -44,15 +203,119 @@ async def root():
     return {"message": "Financial Document Analyzer API is running"}
 
 
+# ─────────────────────────────────────────────────────────────
+# Background Analysis (runs on a job worker thread)
+# ─────────────────────────────────────────────────────────────
+def _run_mode(mode: str, query: str, file_path: str, usage: TokenUsage, classification, profile):
+    # Returns (analysis text, mode-specific result fields)
+    if classification.decision == REJECT:
+        # Junk uploads never reach a crew, whatever the mode
+        outcome = rejection(classification)
+        return merge_sections(outcome["sections"]), outcome
+
+    if mode == INCREMENTAL:
+        # Diff against the issuer's latest stored analysis, if there is one
+        with session_scope() as db:
+            base = load_base(db, profile.issuer_key)
+        outcome = run_incremental(query=query, file_path=file_path, profile=profile, base=base, usage=usage)
+        return outcome["report"], {"incremental": outcome["incremental"]}
+
+    if mode == PIPELINE:
+        outcome = run_pipeline(query=query, file_path=file_path, usage=usage, classification=classification)
+        return merge_sections(outcome["sections"]), {"verdict": outcome["verdict"], "sections": outcome["sections"]}
+
+    if mode == MAP_REDUCE:
+        outcome = run_map_reduce(query=query, file_path=file_path, usage=usage)
+        return outcome["report"], {"chunks": outcome["chunks"]}
+
+    return str(run_crew(query=query, file_path=file_path, usage=usage)), {}
+
+
+def process_document(file_path: str, filename: str, query: str,
+                     cache_key: str = None, store: bool = True, mode: str = STANDARD,
+                     lane: str = INTERACTIVE, bypass: bool = False, channel: ProgressChannel = None,
+                     profile: bool = False):
+    # Everything the job does runs under the request's policies: the LLM lane,
+    # the memo directives from Cache-Control, the (optional) progress stream
+    # and, when requested with X-Profile, a cProfile dump of the worker thread
+    with llm_lane(lane), memo_policy(read=not bypass, write=store), reporting_to(channel), profiled(profile):
+        return _analyze_document(file_path, filename, query, cache_key, store, mode)
+
+
+def _analyze_document(file_path: str, filename: str, query: str,
+                      cache_key: str, store: bool, mode: str):
+    try:
+        # Parse and index the document once, before any agent asks for it
+        emit(STAGE, stage="parsing")
+        document = ingest(file_path)
+
+        # Classify locally: reject junk, and skip the LLM verifier for clear filings
+        classification = pre_verify(document)
+
+        # Issuer and paragraph fingerprints, kept with the result so the
+        # issuer's next filing can be analyzed incrementally
+        profile = DocumentProfile.from_document(document)
+        emit(STAGE, stage="analysis", mode=mode)
+
+        # Run CrewAI
+        usage = TokenUsage()
+        with span("analysis", mode=mode):
+            analysis, extra = _run_mode(mode, query, file_path, usage, classification, profile)
+        rejected = extra.get("verdict") == "fail"
+        # Only successful analyses are cached; the stored row carries no
+        # status, so a rejected one would be replayed as a success
+        store = store and not rejected
+
+        # Queue the result for the batched background writer
+        emit(STAGE, stage="saving")
+        result_writer.submit(AnalysisResult(
+            filename=filename,
+            query=query,
+            analysis=analysis,
+            model=MODEL_NAME,
+            cache_key=cache_key if store else None,
+            issuer=profile.issuer_key,
+            fingerprints=[] if rejected else profile.fingerprint_rows(),
+            **usage.counts
+        ))
+
+        result = {
+            "status": "rejected" if rejected else "success",
+            "query": query,
+            "mode": mode,
+            "analysis": analysis,
+            "file_processed": filename,
+            "token_usage": usage.counts,
+            "document_type": classification.document_type,
+            "classification": classification.to_dict(),
+            **extra
+        }
+
+        if cache_key and store:
+            result_cache.put(cache_key, result)
+
+        return result
+
+    finally:
+        # Cleanup uploaded file
+        _remove_upload(file_path)
+
+
 # ─────────────────────────────────────────────────────────────
 # Analyze Financial Document
 # ─────────────────────────────────────────────────────────────
-@app.post("/analyze")
+@app.post("/analyze", status_code=202)
 async def analyze_financial_document(
+    response: Response,
     file: UploadFile = File(...),
-    query: str = Form(default="Analyze this financial document for investment insights")
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    mode: str = Form(default=STANDARD),
+    cache_control: str = Header(default=None),
+    x_profile: bool = Header(default=False)
 ):
 
+    _validate_mode(mode)
+
     file_id = str(uuid.uuid4())
     file_path = f"data/financial_document_{file_id}.pdf"
 
@@ -60,71 +323,472 @@ async def analyze_financial_document(
         # Ensure folder exists
         os.makedirs("data", exist_ok=True)
 
-        # Save uploaded file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Stream the upload to disk in chunks, hashing as we go
+        _, content_hash = await spool_upload(file, file_path)
+        document_store.register(file_path, content_hash)
 
         if not query:
             query = "Analyze this financial document for investment insights"
+        query = query.strip()
 
-        # Run CrewAI
-        response = run_crew(query=query.strip(), file_path=file_path)
+        # Serve identical document + query + model + prompts from the cache
+        cache_key = result_cache_key(
+            content_hash, query, MODEL_NAME, PROMPT_VERSION, mode
+        )
+        bypass, store = _cache_directives(cache_control)
 
-        # Save result to SQLite database
-        db: Session = SessionLocal()
+        if not bypass:
+            # A miss falls through to SQLite and decompression, so keep it off the event loop
+            cached = await run_in_threadpool(result_cache.get, cache_key, _load_stored_result)
+            if cached is not None:
+                _remove_upload(file_path)
+                response.status_code = 200
+                return {**cached, "query": query, "file_processed": file.filename, "cached": True}
 
-        db_record = AnalysisResult(
-            filename=file.filename,
-            query=query,
-            analysis=str(response)
+        # Hand the crew run to the worker pool; the file now belongs to the job
+        job = job_queue.submit(
+            process_document, file_path, file.filename, query, cache_key, store, mode, INTERACTIVE, bypass,
+            profile=x_profile, on_cancel=lambda: _remove_upload(file_path)
         )
 
-        db.add(db_record)
-        db.commit()
-        db.close()
-
         return {
-            "status": "success",
-            "query": query,
-            "analysis": str(response),
+            "status": job.status,
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}",
             "file_processed": file.filename
         }
 
+    except UploadTooLarge as e:
+        _remove_upload(file_path)
+        raise HTTPException(status_code=413, detail=str(e))
+
+    except QueueFull:
+        _remove_upload(file_path)
+        raise HTTPException(
+            status_code=429,
+            detail="Analysis queue is full, please retry later",
+            headers={"Retry-After": str(JOB_RETRY_AFTER)}
+        )
+
+    except Exception as e:
+        _remove_upload(file_path)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing financial document: {str(e)}"
+        )
+
+
+# ─────────────────────────────────────────────────────────────
+# Streaming Analysis (Server-Sent Events)
+# ─────────────────────────────────────────────────────────────
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+@app.post("/analyze/stream")
+async def analyze_financial_document_stream(
+    file: UploadFile = File(...),
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    mode: str = Form(default=STANDARD),
+    tokens: bool = Form(default=True),
+    cache_control: str = Header(default=None),
+    x_profile: bool = Header(default=False)
+):
+
+    _validate_mode(mode)
+
+    file_id = str(uuid.uuid4())
+    file_path = f"data/financial_document_{file_id}.pdf"
+
+    try:
+        os.makedirs("data", exist_ok=True)
+
+        _, content_hash = await spool_upload(file, file_path)
+        document_store.register(file_path, content_hash)
+
+        query = (query or "Analyze this financial document for investment insights").strip()
+
+        cache_key = result_cache_key(content_hash, query, MODEL_NAME, PROMPT_VERSION, mode)
+        bypass, store = _cache_directives(cache_control)
+
+        cached = None if bypass else await run_in_threadpool(result_cache.get, cache_key, _load_stored_result)
+        if cached is not None:
+            _remove_upload(file_path)
+            payload = {**cached, "query": query, "file_processed": file.filename, "cached": True}
+            return StreamingResponse(
+                iter([sse_event(RESULT, json.dumps(payload, default=str))]),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
+
+        # The worker publishes stage, task and token events into the channel
+        channel = ProgressChannel(tokens=tokens)
+        job = job_queue.submit(
+            process_document, file_path, file.filename, query, cache_key, store, mode,
+            INTERACTIVE, bypass, channel, profile=x_profile, on_cancel=lambda: _remove_upload(file_path)
+        )
+        job.future.add_done_callback(lambda _: channel.close())
+
+    except UploadTooLarge as e:
+        _remove_upload(file_path)
+        raise HTTPException(status_code=413, detail=str(e))
+
+    except QueueFull:
+        _remove_upload(file_path)
+        raise HTTPException(
+            status_code=429,
+            detail="Analysis queue is full, please retry later",
+            headers={"Retry-After": str(JOB_RETRY_AFTER)}
+        )
+
     except Exception as e:
+        _remove_upload(file_path)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing financial document: {str(e)}"
         )
 
+    return StreamingResponse(
+        _stream_job(job, channel, file.filename),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+async def _stream_job(job, channel: ProgressChannel, filename: str):
+    # First byte goes out immediately; heartbeats keep idle connections open
+    yield sse_event(QUEUED, json.dumps({
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "file_processed": filename
+    }))
+
+    async for event, data in channel.events():
+        if event is None:
+            yield SSE_HEARTBEAT
+            continue
+        yield sse_event(event, json.dumps(data, default=str))
+
+    # The job keeps running if the client disconnects; its result stays at /jobs/{job_id}
+    if job.status == COMPLETED:
+        yield sse_event(RESULT, json.dumps({"job_id": job.id, **job.result}, default=str))
+    else:
+        yield sse_event(ERROR, json.dumps({"job_id": job.id, "status": job.status, "error": job.error}))
+
+
+# ─────────────────────────────────────────────────────────────
+# Batch Analysis
+# ─────────────────────────────────────────────────────────────
+@app.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    queries: str = Form(default=None),
+    mode: str = Form(default=STANDARD),
+    cache_control: str = Header(default=None)
+):
+
+    _validate_mode(mode)
+
+    # Optional per-file queries: a JSON object mapping filename -> query
+    try:
+        query_map = json.loads(queries) if queries else {}
+        if not isinstance(query_map, dict):
+            raise ValueError()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="queries must be a JSON object of filename -> query")
+
+    os.makedirs("data", exist_ok=True)
+    entries = []
+
+    try:
+        for upload in files:
+            if is_archive(upload.filename):
+                archive_path = f"data/batch_{uuid.uuid4()}{archive_suffix(upload.filename)}"
+                try:
+                    await spool_upload(upload, archive_path)
+                    # Documents already stored count against the same byte budget
+                    stored = sum(os.path.getsize(path) for _, path, _ in entries)
+                    entries.extend(await run_in_threadpool(
+                        expand_archive, archive_path, "data",
+                        BATCH_MAX_FILES - len(entries), BATCH_MAX_BYTES - stored
+                    ))
+                finally:
+                    _remove_upload(archive_path)
+            else:
+                file_path = f"data/financial_document_{uuid.uuid4()}.pdf"
+                entries.append((upload.filename, file_path, None))
+                _, content_hash = await spool_upload(upload, file_path)
+                entries[-1] = (upload.filename, file_path, content_hash)
+
+            if len(entries) > BATCH_MAX_FILES:
+                raise TooManyFiles(f"Batch contains more than {BATCH_MAX_FILES} documents")
+
+    except (UploadTooLarge, TooManyFiles) as e:
+        for _, file_path, _ in entries:
+            _remove_upload(file_path)
+        raise HTTPException(status_code=413, detail=str(e))
+
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        for _, file_path, _ in entries:
+            _remove_upload(file_path)
+        raise HTTPException(status_code=400, detail=f"Invalid archive: {str(e)}")
+
+    bypass, store = _cache_directives(cache_control)
+    default_query = (query or "Analyze this financial document for investment insights").strip()
+
+    return StreamingResponse(
+        _run_batch(entries, query_map, default_query, mode, bypass, store),
+        media_type="application/x-ndjson"
+    )
+
+
+async def _run_batch(entries, query_map, default_query, mode, bypass, store):
+    # Streams one NDJSON line per document, in completion order
+    def line(filename, content_hash, payload):
+        return json.dumps({"filename": filename, "content_hash": content_hash, **payload}, default=str) + "\n"
+
+    groups = {}
+    for filename, file_path, content_hash in entries:
+        document_store.register(file_path, content_hash)
+        file_query = (query_map.get(filename) or default_query).strip()
+        cache_key = result_cache_key(content_hash, file_query, MODEL_NAME, PROMPT_VERSION, mode)
+
+        cached = None if bypass else await run_in_threadpool(result_cache.get, cache_key, _load_stored_result)
+        if cached is not None:
+            _remove_upload(file_path)
+            yield line(filename, content_hash, {**cached, "query": file_query, "cached": True})
+            continue
+
+        # Identical document + query in the same batch: analyze once, report for each
+        if cache_key in groups:
+            _remove_upload(file_path)
+            groups[cache_key]["duplicates"].append(filename)
+            continue
+
+        groups[cache_key] = {
+            "filename": filename,
+            "file_path": file_path,
+            "content_hash": content_hash,
+            "query": file_query,
+            "duplicates": [],
+        }
+
+    waiting = list(groups.items())
+    running = {}
+
+    try:
+        while waiting or running:
+            # Keep at most BATCH_MAX_IN_FLIGHT jobs queued so interactive calls still get slots
+            while waiting and len(running) < BATCH_MAX_IN_FLIGHT:
+                cache_key, group = waiting[0]
+                try:
+                    job = job_queue.submit(
+                        process_document, group["file_path"], group["filename"],
+                        group["query"], cache_key, store, mode, BATCH, bypass,
+                        on_cancel=lambda path=group["file_path"]: _remove_upload(path)
+                    )
+                except QueueFull:
+                    break
+                waiting.pop(0)
+                running[asyncio.wrap_future(job.future)] = (group, job)
+
+            if not running:
+                await asyncio.sleep(BATCH_RETRY_INTERVAL)
+                continue
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                group, job = running.pop(future)
+                payload = {"job_id": job.id, "job_status": job.status, **(job.result or {"status": job.status})}
+                if job.error:
+                    payload["error"] = job.error
+
+                yield line(group["filename"], group["content_hash"], payload)
+                for duplicate in group["duplicates"]:
+                    yield line(duplicate, group["content_hash"], {**payload, "duplicate_of": group["filename"]})
+
     finally:
-        # Cleanup uploaded file
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except:
-                pass
+        # Client went away: drop documents that never reached a worker
+        for _, group in waiting:
+            _remove_upload(group["file_path"])
+
+
+# ─────────────────────────────────────────────────────────────
+# Job Status / Cancellation
+# ─────────────────────────────────────────────────────────────
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job.to_dict()
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job.to_dict()
+
+
+# ─────────────────────────────────────────────────────────────
+# Cache Statistics
+# ─────────────────────────────────────────────────────────────
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**result_cache.stats(), "llm_memo": await run_in_threadpool(llm_memo.stats)}
+
+
+# ─────────────────────────────────────────────────────────────
+# Prometheus Metrics
+# ─────────────────────────────────────────────────────────────
+def _cache_gauge(field: str):
+    def collect():
+        return {
+            ("result",): result_cache.stats()[field],
+            ("llm_memo",): llm_memo.stats()[field],
+        }
+    return collect
+
+
+metrics.register(Gauge(
+    "analyzer_job_queue_depth", "Analysis jobs waiting for a worker.",
+    lambda: {(): job_queue.depth()}
+))
+metrics.register(Gauge(
+    "analyzer_db_writer_queue_depth", "Results waiting for the background database writer.",
+    lambda: {(): result_writer.depth()}
+))
+metrics.register(Gauge(
+    "analyzer_llm_waiting_calls", "LLM calls waiting for the rate limiter, by priority lane.",
+    lambda: {(lane,): count for lane, count in llm_scheduler.stats()["waiting"].items()},
+    ("lane",)
+))
+metrics.register(Gauge(
+    "analyzer_cache_hit_ratio", "Hit ratio of the result cache and the LLM response memo.",
+    _cache_gauge("hit_ratio"), ("cache",)
+))
+metrics.register(Gauge(
+    "analyzer_cache_entries", "Entries held by the result cache and the LLM response memo.",
+    _cache_gauge("entries"), ("cache",)
+))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    # Collecting the memo figures touches SQLite, so render off the event loop
+    body = await run_in_threadpool(metrics.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
 
 # ─────────────────────────────────────────────────────────────
 # Fetch Stored Results
 # ─────────────────────────────────────────────────────────────
+RESULT_FIELDS = (
+    "id", "filename", "query", "analysis", "analysis_size", "model",
+    "prompt_tokens", "completion_tokens", "total_tokens", "issuer", "created_at"
+)
+DEFAULT_RESULT_FIELDS = "id,filename,query,created_at"
+
+
 @app.get("/results")
-def get_results():
-    db: Session = SessionLocal()
-    results = db.query(AnalysisResult).all()
-    db.close()
-
-    return [
-        {
-            "id": r.id,
-            "filename": r.filename,
-            "query": r.query,
-            "analysis": r.analysis,
-            "created_at": r.created_at
-        }
-        for r in results
+def get_results(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: int = Query(default=None, description="next_cursor from the previous page"),
+    filename: str = Query(default=None),
+    created_after: datetime = Query(default=None),
+    created_before: datetime = Query(default=None),
+    q: str = Query(default=None, description="Substring of the stored query"),
+    fields: str = Query(default=DEFAULT_RESULT_FIELDS, description="Comma-separated columns to return"),
+    db: Session = Depends(get_db)
+):
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in RESULT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in selected:
+        selected.insert(0, "id")
+
+    # Project only the requested columns; the compressed body is joined only if asked for
+    columns = [
+        getattr(AnalysisResult, f) if f != "analysis" else AnalysisBlob
+        for f in selected
+    ]
+    query = db.query(*columns)
+    if "analysis" in selected:
+        query = query.join(AnalysisBlob, AnalysisResult.analysis_hash == AnalysisBlob.hash)
+
+    if cursor is not None:
+        query = query.filter(AnalysisResult.id < cursor)
+    if filename:
+        query = query.filter(AnalysisResult.filename == filename)
+    if created_after:
+        query = query.filter(AnalysisResult.created_at >= created_after)
+    if created_before:
+        query = query.filter(AnalysisResult.created_at < created_before)
+    if q:
+        query = query.filter(AnalysisResult.query.ilike(f"%{q}%"))
+
+    # Keyset pagination: newest first, one extra row to detect another page
+    rows = query.order_by(AnalysisResult.id.desc()).limit(limit + 1).all()
+
+    items = [
+        {f: (value.text if f == "analysis" else value) for f, value in zip(selected, row)}
+        for row in rows[:limit]
     ]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# Declared before /results/{result_id} so "search" isn't parsed as an id
+@app.get("/results/search")
+def search_stored_results(
+    q: str = Query(..., min_length=1, description='Words to match; "quoted phrase", prefix*'),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0, le=10000),
+    db: Session = Depends(get_db)
+):
+    if not search_available():
+        raise HTTPException(status_code=501, detail="Full-text search requires SQLite with FTS5")
+
+    expression = match_expression(q)
+    if expression is None:
+        raise HTTPException(status_code=422, detail="Search query has no terms")
+
+    # One extra hit to detect another page
+    hits = search_results(db, expression, limit + 1, offset)
+    next_offset = offset + limit if len(hits) > limit else None
+
+    return {"items": hits[:limit], "next_offset": next_offset}
+
+
+@app.get("/results/{result_id}")
+def get_result(result_id: int, db: Session = Depends(get_db)):
+    record = db.query(AnalysisResult).filter(AnalysisResult.id == result_id).first()
+
+    if record is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+
+    return {
+        "id": record.id,
+        "filename": record.filename,
+        "query": record.query,
+        "analysis": record.analysis,
+        "analysis_size": record.analysis_size,
+        "model": record.model,
+        "prompt_tokens": record.prompt_tokens,
+        "completion_tokens": record.completion_tokens,
+        "total_tokens": record.total_tokens,
+        "created_at": record.created_at
+    }
 
 
 # ─────────────────────────────────────────────────────────────
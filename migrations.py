@@ -0,0 +1,98 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from models import AnalysisResult, AnalysisBlob
+
+logger = logging.getLogger(__name__)
+
+
+# ── Schema Upgrade ───────────────────────────────────────────────────────────
+## create_all() only creates missing tables, so databases created by earlier
+## versions are brought forward here: new columns and indexes are added and
+## inline analysis bodies are moved into compressed, deduplicated blobs.
+## Every step checks before it changes anything, so a database from any
+## earlier version can be upgraded.
+
+## (column, DDL) in the order they were added
+ADDED_COLUMNS = (
+    ## Result cache lookups
+    ("cache_key", "VARCHAR(64)"),
+    ## Compressed, content-addressed analysis bodies
+    ("analysis_hash", "VARCHAR(64)"),
+    ("analysis_size", "INTEGER"),
+    ## Token usage
+    ("model", "VARCHAR"),
+    ("prompt_tokens", "INTEGER"),
+    ("completion_tokens", "INTEGER"),
+    ("total_tokens", "INTEGER"),
+    ## Incremental analysis
+    ("issuer", "VARCHAR"),
+)
+
+## Indexed columns of analysis_results, named as create_all() names them
+ADDED_INDEXES = (
+    "cache_key",
+    ## /results filters and keyset pagination
+    "filename",
+    "created_at",
+    ## Blob joins and issuer lookups
+    "analysis_hash",
+    "issuer",
+)
+
+MIGRATION_BATCH_SIZE = 500
+
+
+def upgrade(engine):
+    inspector = inspect(engine)
+    if AnalysisResult.__tablename__ not in inspector.get_table_names():
+        return
+
+    columns = {c["name"] for c in inspector.get_columns(AnalysisResult.__tablename__)}
+
+    with engine.begin() as conn:
+        for name, ddl in ADDED_COLUMNS:
+            if name not in columns:
+                conn.exec_driver_sql(f"ALTER TABLE analysis_results ADD COLUMN {name} {ddl}")
+
+        for name in ADDED_INDEXES:
+            conn.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_analysis_results_{name} ON analysis_results ({name})"
+            )
+
+        if "analysis" in columns:
+            _move_bodies_to_blobs(conn)
+            conn.exec_driver_sql("ALTER TABLE analysis_results DROP COLUMN analysis")
+            logger.info("Moved inline analysis bodies into analysis_blobs")
+
+
+def _move_bodies_to_blobs(conn):
+    blobs = AnalysisBlob.__table__
+    last_id = 0
+
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, analysis FROM analysis_results "
+                "WHERE id > :last_id AND analysis_hash IS NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": MIGRATION_BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            return
+
+        for row_id, body in rows:
+            blob = AnalysisBlob.from_text(body or "")
+            exists = conn.execute(
+                blobs.select().with_only_columns(blobs.c.hash).where(blobs.c.hash == blob.hash)
+            ).first()
+            if exists is None:
+                conn.execute(blobs.insert().values(
+                    hash=blob.hash, codec=blob.codec, size=blob.size, data=blob.data
+                ))
+            conn.execute(
+                text("UPDATE analysis_results SET analysis_hash = :hash, analysis_size = :size WHERE id = :id"),
+                {"hash": blob.hash, "size": blob.size, "id": row_id},
+            )
+            last_id = row_id
@@ -1,13 +1,78 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary, ForeignKey
+from sqlalchemy.orm import relationship
 from datetime import datetime
+import hashlib
 from database import Base
+from compression import compress, decompress, DEFAULT_CODEC
+
+
+class AnalysisBlob(Base):
+    """Compressed analysis body, stored once per distinct text (content-addressed)."""
+    __tablename__ = "analysis_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    codec = Column(String(8), nullable=False)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+    @classmethod
+    def from_text(cls, text: str):
+        return cls(
+            hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            codec=DEFAULT_CODEC,
+            size=len(text.encode("utf-8")),
+            data=compress(text, DEFAULT_CODEC),
+        )
+
+    @property
+    def text(self) -> str:
+        return decompress(self.data, self.codec)
+
+
+class SectionFingerprint(Base):
+    """Paragraph hashes of one section of an analyzed document, for incremental analysis of later filings."""
+    __tablename__ = "section_fingerprints"
+
+    id = Column(Integer, primary_key=True)
+    result_id = Column(Integer, ForeignKey("analysis_results.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    section = Column(String, nullable=False)
+    start_page = Column(Integer, nullable=False)
+    end_page = Column(Integer, nullable=False)
+    # Space-separated hex digests, in document order
+    paragraphs = Column(Text, nullable=False)
 
 
 class AnalysisResult(Base):
     __tablename__ = "analysis_results"
 
     id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, nullable=False)
+    filename = Column(String, nullable=False, index=True)
     query = Column(Text, nullable=False)
-    analysis = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    analysis_hash = Column(String(64), ForeignKey("analysis_blobs.hash"), nullable=False, index=True)
+    analysis_size = Column(Integer, nullable=True)
+    model = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    total_tokens = Column(Integer, nullable=True)
+    cache_key = Column(String(64), index=True, nullable=True)
+    issuer = Column(String, index=True, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Loaded (and decompressed) only when .analysis is read
+    blob = relationship(AnalysisBlob, lazy="select")
+
+    # Written with the result; read only when a later filing is analyzed incrementally
+    fingerprints = relationship(
+        SectionFingerprint, lazy="select", cascade="all, delete-orphan", order_by=SectionFingerprint.position
+    )
+
+    @property
+    def analysis(self) -> str:
+        return self.blob.text if self.blob is not None else None
+
+    @analysis.setter
+    def analysis(self, text: str):
+        self.blob = AnalysisBlob.from_text(text)
+        self.analysis_hash = self.blob.hash
+        self.analysis_size = self.blob.size
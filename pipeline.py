@@ -0,0 +1,381 @@
+import contextvars
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+## Agents and tasks are looked up by name and built on first use; importing
+## task registers both the task and agent factories
+import task  # noqa: F401
+from registry import registry
+
+## Stage and task events for streaming clients (no-ops otherwise)
+from progress import emit, task_progress, STAGE, TASK_COMPLETED
+
+## Stage timings and per-agent token counters for /metrics
+from telemetry import span, record_tokens, classifier_decisions
+
+## Local pre-verification decides which documents still need the LLM verifier
+from classifier import classify_document, REJECT, AMBIGUOUS
+
+## Section-aware chunking for the map-reduce mode
+from chunking import chunk_document, estimate_tokens, CHUNK_MAX_TOKENS
+
+## Parsed once here so every specialist reads the same cached text
+## (the search index and metrics modules pull in NumPy/pandas, so they are
+## imported on first ingest rather than at application startup)
+from docstore import document_store
+
+logger = logging.getLogger(__name__)
+
+
+## ── Analysis Modes ───────────────────────────────────────────────────────────
+## standard:   the single financial analysis task (original behaviour)
+## pipeline:   verification gates the run, then the three specialists fan out
+## map_reduce: section-aware chunks are analysed in parallel, then merged
+## incremental: only passages changed since the issuer's last analysed filing
+##              are analysed, and merged into that earlier report
+
+STANDARD = "standard"
+PIPELINE = "pipeline"
+MAP_REDUCE = "map_reduce"
+INCREMENTAL = "incremental"
+
+ANALYSIS_MODES = (STANDARD, PIPELINE, MAP_REDUCE, INCREMENTAL)
+
+MAP_REDUCE_WORKERS = int(os.getenv("MAP_REDUCE_WORKERS", "4"))
+
+SPECIALISTS = (
+    ("financial_analysis", "financial_analyst", "financial_analysis_task"),
+    ("investment_analysis", "investment_advisor", "investment_analysis"),
+    ("risk_assessment", "risk_assessor", "risk_assessment"),
+)
+
+SECTION_TITLES = {
+    "verification": "Document Verification",
+    "financial_analysis": "Financial Analysis",
+    "investment_analysis": "Investment Analysis",
+    "risk_assessment": "Risk Assessment",
+}
+
+_VERDICT = re.compile(r"VERDICT:\s*(PASS|FAIL)", re.IGNORECASE)
+
+
+## ── Ingest ───────────────────────────────────────────────────────────────────
+
+def ingest(file_path: str):
+    """
+    Parses the document, builds its relevance index and extracts its
+    financial metrics before any agent runs, so tool calls during the crew
+    only ever hit the local stores.
+    """
+    from search_index import get_search_index
+
+    with span("parse"):
+        document = document_store.load(file_path)
+    with span("index"):
+        get_search_index(document)
+    with span("financial_metrics"):
+        financial_metrics(document)
+    return document
+
+
+def financial_metrics(document):
+    """
+    The document's FinancialMetrics, or None if its tables can't be read.
+    Metrics only sharpen the analysis, so an unusual table layout is logged
+    rather than failing the whole run.
+    """
+    from financials import get_financial_metrics
+
+    try:
+        return get_financial_metrics(document)
+    except Exception:
+        logger.exception("Could not extract financial metrics from %s", document.content_hash)
+        return None
+
+
+## ── Token Usage ──────────────────────────────────────────────────────────────
+
+class TokenUsage:
+    """Thread-safe tally of LLM token usage across the crews of one analysis."""
+
+    FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, crew_output):
+        metrics = getattr(crew_output, "token_usage", None)
+        if metrics is None:
+            return
+        with self._lock:
+            for field in self.FIELDS:
+                self.counts[field] += getattr(metrics, field, 0) or 0
+
+
+## ── Single Task Runner ───────────────────────────────────────────────────────
+
+def run_single_task(agent: str, task: str, inputs: dict, usage: TokenUsage = None):
+    """
+    Runs one task in its own crew. The agent and task are registry names;
+    Crew.copy() clones the shared instances so concurrent runs never share
+    mutable Task state (output, context, etc.).
+    """
+    from crewai import Crew, Process
+
+    crew = Crew(
+        agents=[registry.get(agent)],
+        tasks=[registry.get(task)],
+        process=Process.sequential,
+    ).copy()
+
+    with task_progress(task, agent), span(f"task:{task}", agent=agent):
+        output = crew.kickoff(inputs)
+    if usage is not None:
+        usage.add(output)
+    record_tokens(agent, output)
+
+    emit(TASK_COMPLETED, task=task, agent=agent, output=str(output))
+
+    return output
+
+
+def submit_in_context(pool: ThreadPoolExecutor, fn, *args):
+    """pool.submit() that carries the caller's context (e.g. its LLM lane) into the worker."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+## ── Verification Gate ────────────────────────────────────────────────────────
+
+def parse_verdict(verification_output: str) -> str:
+    """Returns 'pass' or 'fail'; a missing verdict is not treated as a rejection."""
+    match = _VERDICT.search(verification_output)
+    if match and match.group(1).upper() == "FAIL":
+        return "fail"
+    return "pass"
+
+
+def pre_verify(document):
+    """
+    Classifies the parsed document locally, in milliseconds and without the
+    LLM: junk is rejected before any crew runs, clear filings skip the
+    verifier, and only ambiguous documents are sent to it.
+    """
+    with span("classify"):
+        classification = classify_document(document, financial_metrics(document))
+
+    classifier_decisions.inc(decision=classification.decision, document_type=classification.document_type)
+    emit(STAGE, stage="classification", decision=classification.decision,
+         document_type=classification.document_type)
+    return classification
+
+
+def rejection(classification) -> dict:
+    """The pipeline outcome for a document rejected before any agent ran."""
+    return {"verdict": "fail", "sections": {"verification": classification.verification_text()}}
+
+
+## ── Parallel Pipeline ────────────────────────────────────────────────────────
+
+def run_pipeline(query: str, file_path: str, usage: TokenUsage = None, classification=None) -> dict:
+    """
+    Verifies the document, then runs the financial, investment and risk
+    tasks concurrently. Latency is verification + the slowest specialist
+    rather than the sum of all four. The LLM verifier only runs when the
+    local classification is ambiguous.
+    """
+    inputs = {"query": query, "file_path": file_path}
+
+    document = ingest(file_path)
+    if classification is None:
+        classification = pre_verify(document)
+    if classification.decision == REJECT:
+        return rejection(classification)
+
+    if classification.decision == AMBIGUOUS:
+        emit(STAGE, stage="verification")
+        verification_output = str(run_single_task("verifier", "verification", inputs, usage))
+    else:
+        verification_output = classification.verification_text()
+    sections = {"verification": verification_output}
+
+    verdict = parse_verdict(verification_output)
+    if verdict == "fail":
+        return {"verdict": verdict, "sections": sections}
+
+    emit(STAGE, stage="specialists", tasks=[name for name, _, _ in SPECIALISTS])
+    with ThreadPoolExecutor(max_workers=len(SPECIALISTS), thread_name_prefix="pipeline") as pool:
+        futures = {
+            name: submit_in_context(pool, run_single_task, agent, task, inputs, usage)
+            for name, agent, task in SPECIALISTS
+        }
+        for name, future in futures.items():
+            sections[name] = str(future.result())
+
+    return {"verdict": verdict, "sections": sections}
+
+
+def merge_sections(sections: dict) -> str:
+    """Combines the per-task outputs into one report for storage."""
+    return "\n\n".join(
+        f"## {SECTION_TITLES.get(name, name)}\n\n{output}"
+        for name, output in sections.items()
+    )
+
+
+## ── Map-Reduce Analysis ──────────────────────────────────────────────────────
+
+def run_map_reduce(query: str, file_path: str, usage: TokenUsage = None,
+                   workers: int = MAP_REDUCE_WORKERS) -> dict:
+    """
+    Analyses a filing that may not fit in the model's context window. Chunks
+    are produced lazily and at most `workers` are in flight, so both prompt
+    size and peak memory are bounded by the chunk size, not the document.
+    """
+    document = ingest(file_path)
+    findings = {}
+
+    emit(STAGE, stage="map")
+    chunks = []
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="map") as pool:
+        in_flight = {}
+
+        for chunk in chunk_document(document.pages()):
+            while len(in_flight) >= workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    findings[in_flight.pop(future)] = future.result()
+
+            chunks.append({
+                "index": chunk.index,
+                "section": chunk.section,
+                "pages": f"{chunk.start_page}-{chunk.end_page}",
+                "tokens": estimate_tokens(chunk.text),
+            })
+            in_flight[submit_in_context(pool, _analyze_chunk, chunk, query, usage)] = chunk.index
+
+        for future in list(in_flight):
+            findings[in_flight.pop(future)] = future.result()
+
+        summaries = [findings[index] for index in sorted(findings)]
+        emit(STAGE, stage="reduce", chunks=len(summaries))
+        report = _reduce(summaries, query, pool, usage)
+
+    return {"report": report, "chunks": chunks}
+
+
+def _analyze_chunk(chunk, query: str, usage: TokenUsage = None) -> str:
+    output = run_single_task("excerpt_analyst", "chunk_analysis_task", {
+        "query": query,
+        "section": chunk.section,
+        "pages": f"{chunk.start_page}-{chunk.end_page}",
+        "chunk_text": chunk.text,
+    }, usage)
+    return f"[{chunk.section}, pages {chunk.start_page}-{chunk.end_page}]\n{output}"
+
+
+def _reduce(summaries: list, query: str, pool: ThreadPoolExecutor, usage: TokenUsage = None) -> str:
+    ## Reduce in rounds so no single synthesis prompt exceeds the chunk budget
+    while True:
+        batches = _batch(summaries, CHUNK_MAX_TOKENS)
+        futures = [submit_in_context(pool, _synthesize, batch, query, usage) for batch in batches]
+        merged = [future.result() for future in futures]
+
+        if len(merged) <= 1:
+            return merged[0] if merged else ""
+        summaries = merged
+
+
+def _synthesize(findings: str, query: str, usage: TokenUsage = None) -> str:
+    return str(run_single_task("excerpt_analyst", "report_synthesis_task", {
+        "query": query,
+        "findings": findings,
+    }, usage))
+
+
+def _batch(summaries: list, max_tokens: int) -> list:
+    ## At least two summaries per batch, so every round shrinks the list
+    batches, current, size = [], [], 0
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        if len(current) >= 2 and size + tokens > max_tokens:
+            batches.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(summary)
+        size += tokens
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+
+## ── Incremental Analysis ─────────────────────────────────────────────────────
+
+def run_incremental(query: str, file_path: str, profile, base=None, usage: TokenUsage = None,
+                    workers: int = MAP_REDUCE_WORKERS) -> dict:
+    """
+    Analyses a filing against the issuer's most recent stored analysis (base).
+    Only paragraphs the base document doesn't contain are sent to the LLM,
+    together with the earlier report, so an unchanged quarter costs nothing
+    and a typical one costs a fraction of a full run. Without a base the
+    document is analysed in full, as in the standard mode.
+    """
+    from incremental import change_chunks
+
+    info = {
+        "issuer": profile.issuer,
+        "base_result_id": base.result_id if base else None,
+        "document_tokens": profile.token_count(),
+    }
+
+    if base is None:
+        return {"report": _baseline(query, file_path, usage), "incremental": info}
+
+    changed, removed = profile.changes(base)
+    chunks = change_chunks(changed)
+    info.update({
+        "changed_sections": [
+            {"section": s.title, "pages": f"{s.start_page}-{s.end_page}", "paragraphs": len(s.paragraphs)}
+            for s in changed
+        ],
+        "removed_sections": removed,
+        "changed_tokens": sum(estimate_tokens(chunk.text) for chunk in chunks),
+    })
+
+    if not chunks and not removed:
+        ## Same text as the base filing: its report still stands, unless it
+        ## was written for another question
+        if base.query == query:
+            return {"report": base.analysis, "incremental": info}
+        return {"report": _baseline(query, file_path, usage), "incremental": info}
+
+    emit(STAGE, stage="delta", sections=[s.title for s in changed], removed=removed)
+
+    if len(chunks) <= 1:
+        changes = chunks[0].text if chunks else "(no new or changed passages)"
+    else:
+        ## Too much changed for one prompt: summarize the changes first
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="delta") as pool:
+            futures = [submit_in_context(pool, _analyze_chunk, chunk, query, usage) for chunk in chunks]
+            findings = [future.result() for future in futures]
+            changes = _reduce(findings, query, pool, usage)
+
+    report = run_single_task("excerpt_analyst", "delta_analysis_task", {
+        "query": query,
+        "prior_analysis": base.analysis,
+        "changes": changes,
+        "removed_sections": ", ".join(removed) or "none",
+    }, usage)
+    return {"report": str(report), "incremental": info}
+
+
+def _baseline(query: str, file_path: str, usage: TokenUsage = None) -> str:
+    emit(STAGE, stage="baseline")
+    report = run_single_task("financial_analyst", "financial_analysis_task", {
+        "query": query,
+        "file_path": file_path,
+    }, usage)
+    return str(report)
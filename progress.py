@@ -0,0 +1,102 @@
+import asyncio
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+## Progress events flow from the job worker thread (and the pipeline threads it
+## fans out to) to the request's event loop. Producers never block: events are
+## handed to the loop with call_soon_threadsafe.
+
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+## Event names
+QUEUED = "queued"
+STAGE = "stage"
+TASK_STARTED = "task_started"
+TASK_COMPLETED = "task_completed"
+TOKEN = "token"
+RESULT = "result"
+ERROR = "error"
+
+_channel = ContextVar("progress_channel", default=None)
+_task = ContextVar("progress_task", default=None)
+
+
+# ── Progress Channel ─────────────────────────────────────────────────────────
+
+class ProgressChannel:
+    """One job's event stream, consumed by a single streaming response."""
+
+    _CLOSED = object()
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None, tokens: bool = True):
+        self._loop = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self.tokens = tokens
+
+    def publish(self, event: str, data: dict):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (event, data))
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, self._CLOSED)
+
+    async def events(self, heartbeat: float = SSE_HEARTBEAT_SECONDS):
+        """Yields (event, data) until closed; (None, None) after `heartbeat` seconds of silence."""
+        while True:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None, None
+                continue
+
+            if item is self._CLOSED:
+                return
+            yield item
+
+
+@contextmanager
+def reporting_to(channel: ProgressChannel):
+    """Routes emit() calls made in the enclosed block (and contexts copied from it) to channel."""
+    token = _channel.set(channel)
+    try:
+        yield
+    finally:
+        _channel.reset(token)
+
+
+def emit(event: str, **data):
+    channel = _channel.get()
+    if channel is not None:
+        channel.publish(event, data)
+
+
+@contextmanager
+def task_progress(task: str, agent: str):
+    """Emits task_started and tags token events from the enclosed block with the task."""
+    emit(TASK_STARTED, task=task, agent=agent)
+    token = _task.set(task)
+    try:
+        yield
+    finally:
+        _task.reset(token)
+
+
+def emit_token(chunk: str):
+    emit(TOKEN, task=_task.get(), text=chunk)
+
+
+def streaming_tokens() -> bool:
+    channel = _channel.get()
+    return channel is not None and channel.tokens
+
+
+# ── Server-Sent Events ───────────────────────────────────────────────────────
+
+def sse_event(event: str, payload: str) -> str:
+    lines = "".join(f"data: {line}\n" for line in payload.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+SSE_HEARTBEAT = ": keep-alive\n\n"
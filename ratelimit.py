@@ -0,0 +1,205 @@
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+## One scheduler per process replaces the per-agent max_rpm throttles: every
+## LLM call from every crew draws from the same request and token budgets,
+## so concurrent jobs share the provider quota instead of racing for it.
+
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+
+## Completion tokens reserved per call until the real size is known
+LLM_COMPLETION_RESERVE = int(os.getenv("LLM_COMPLETION_RESERVE", "1024"))
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60.0"))
+
+## Priority lanes: batch calls only proceed while no interactive call is waiting
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+LANES = (INTERACTIVE, BATCH)
+
+_lane = ContextVar("llm_lane", default=INTERACTIVE)
+
+## Provider errors worth retrying (matched by status code or exception name,
+## so this module doesn't need litellm/openai installed to be imported)
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+RETRYABLE_ERRORS = frozenset({
+    "RateLimitError", "APIConnectionError", "APITimeoutError", "Timeout",
+    "ServiceUnavailableError", "InternalServerError",
+})
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+@contextmanager
+def llm_lane(lane: str):
+    """Runs the enclosed LLM calls in the given priority lane."""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+# ── Token Bucket ─────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    """Refills continuously at capacity-per-minute; not thread-safe on its own."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= amount
+
+    def credit(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+# ── Scheduler ────────────────────────────────────────────────────────────────
+
+class RateLimitScheduler:
+    """
+    Admits LLM calls against requests-per-minute and tokens-per-minute
+    buckets. Callers reserve the prompt estimate plus a completion reserve
+    up front and settle the difference once the response size is known.
+    A rate-limit response pauses admission for everyone, not just the caller.
+    """
+
+    def __init__(self, rpm: int = LLM_RPM, tpm: int = LLM_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._waiting = dict.fromkeys(LANES, 0)
+        self._paused_until = 0.0
+
+    def acquire(self, tokens: int, lane: str = None) -> int:
+        """Blocks until the call may be sent; returns the tokens actually reserved."""
+        lane = lane or current_lane()
+        ## A single call larger than the whole budget would otherwise wait forever
+        tokens = min(tokens, int(self.tokens.capacity))
+
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if lane != INTERACTIVE and self._waiting[INTERACTIVE]:
+                        self._cond.wait()
+                        continue
+
+                    delay = max(
+                        self._paused_until - now,
+                        self.requests.wait_time(1, now),
+                        self.tokens.wait_time(tokens, now),
+                    )
+                    if delay <= 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        return tokens
+
+                    self._cond.wait(delay)
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+
+    def settle(self, reserved: int, used: int):
+        """Returns over-reserved tokens to the bucket (or charges the shortfall)."""
+        with self._cond:
+            if used < reserved:
+                self.tokens.credit(reserved - used)
+            else:
+                self.tokens.take(used - reserved)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def call(self, fn, tokens: int, completion_tokens=None, lane: str = None):
+        """
+        Runs fn() once admitted, retrying retryable provider errors with full
+        jitter exponential backoff. completion_tokens(result) -> int, if given,
+        is used to settle the completion reserve.
+        """
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            reserved = self.acquire(tokens + LLM_COMPLETION_RESERVE, lane)
+            try:
+                result = fn()
+            except Exception as e:
+                ## A failed request still counts against the provider's quota
+                self.settle(reserved, tokens)
+                if attempt == LLM_MAX_RETRIES or not is_retryable(e):
+                    raise
+
+                delay = retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+                if getattr(e, "status_code", None) == 429 or type(e).__name__ == "RateLimitError":
+                    self.pause(delay)
+
+                logger.warning("LLM call failed (%s), retry %d in %.1fs", type(e).__name__, attempt + 1, delay)
+                time.sleep(delay)
+                continue
+
+            used = tokens + (completion_tokens(result) if completion_tokens else LLM_COMPLETION_RESERVE)
+            self.settle(reserved, used)
+            return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self.requests.wait_time(0, now)
+            self.tokens.wait_time(0, now)
+            return {
+                "requests_available": int(self.requests.tokens),
+                "tokens_available": int(self.tokens.tokens),
+                "waiting": dict(self._waiting),
+                "paused_for": max(0.0, round(self._paused_until - now, 2)),
+            }
+
+
+def is_retryable(error: Exception) -> bool:
+    return (getattr(error, "status_code", None) in RETRYABLE_STATUS
+            or type(error).__name__ in RETRYABLE_ERRORS)
+
+
+def retry_after(error: Exception):
+    """Seconds from the provider's Retry-After header, when it sent one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return min(float(value), LLM_BACKOFF_MAX) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+llm_scheduler = RateLimitScheduler()
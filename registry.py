@@ -0,0 +1,44 @@
+import threading
+
+
+# ── Lazy Component Registry ──────────────────────────────────────────────────
+## agents.py and task.py register factories here instead of building CrewAI
+## objects at import time. Each component is built on first use and then
+## shared by every request, so importing the API (and answering health
+## checks) never pays for crewai, langchain or LLM client initialization.
+
+class Registry:
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        ## Re-entrant: building a task builds the agent it belongs to
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory):
+        self._factories[name] = factory
+
+    def has(self, name: str) -> bool:
+        return name in self._factories
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._factories[name]()
+                self._instances[name] = instance
+        return instance
+
+    def built(self) -> list:
+        return list(self._instances)
+
+    def warm_up(self):
+        """Builds every registered component, e.g. on a background thread at startup."""
+        for name in list(self._factories):
+            self.get(name)
+
+
+registry = Registry()
@@ -0,0 +1,264 @@
+import html
+import logging
+import os
+import re
+import time
+
+from sqlalchemy import DateTime, event, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from compression import decompress
+from database import DB_WRITE_RETRIES, IS_SQLITE
+from models import AnalysisResult
+
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+## Stored analyses are bodies compressed into analysis_blobs, so they can't be
+## searched in place. A contentless FTS5 table keeps only the inverted index of
+## each result's query and analysis text, keyed by the result id (its rowid),
+## so the text isn't stored a second time uncompressed. Rows are added in the
+## same transaction as the result itself; snippets are cut from the blob.
+
+SEARCH_TABLE = "analysis_search"
+
+## Tokens of context in each snippet
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "24"))
+
+## bm25 column weights: a match in the query counts double a match in the body
+QUERY_WEIGHT = 2.0
+ANALYSIS_WEIGHT = 1.0
+
+BACKFILL_BATCH_SIZE = 500
+
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+_available = False
+
+
+def search_available() -> bool:
+    return _available
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def create_search_index(engine):
+    """Creates the FTS5 table if needed; search stays disabled without SQLite FTS5."""
+    global _available
+    if not IS_SQLITE:
+        return
+
+    try:
+        with engine.begin() as conn:
+            ## Earlier versions kept a full copy of every analysis in the table;
+            ## it is rebuilt contentless and refilled by the backfill
+            existing = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)
+            ).scalar()
+            if existing is not None and "content=''" not in existing:
+                conn.exec_driver_sql(f"DROP TABLE {SEARCH_TABLE}")
+                logger.info("Rebuilding %s as a contentless index", SEARCH_TABLE)
+
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                f"USING fts5(query, analysis, content='', tokenize='porter unicode61')"
+            )
+    except OperationalError:
+        logger.warning("SQLite was built without FTS5; /results/search is disabled")
+        return
+    _available = True
+
+
+def backfill_search_index(engine, batch_size: int = BACKFILL_BATCH_SIZE, retries: int = DB_WRITE_RETRIES):
+    """Indexes results stored before the search table existed. Safe to run alongside new inserts."""
+    if not _available:
+        return
+
+    last_id = 0
+    indexed = 0
+    while True:
+        for attempt in range(retries + 1):
+            try:
+                count, batch_last_id = _backfill_batch(engine, last_id, batch_size)
+                break
+            except (OperationalError, IntegrityError):
+                # A busy or locked database, or a result indexed by its own insert
+                # in the meantime; the batch is retried from the last indexed id
+                if attempt == retries:
+                    logger.exception("Search backfill stopped after %d indexed analyses", indexed)
+                    return
+                time.sleep(min(0.05 * 2 ** attempt, 2.0))
+
+        if not count:
+            break
+        last_id = batch_last_id
+        indexed += count
+
+    if indexed:
+        logger.info("Indexed %d stored analyses for full-text search", indexed)
+
+
+def _backfill_batch(engine, last_id: int, batch_size: int):
+    """Indexes the next batch after last_id in one transaction; returns (count, last id)."""
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT r.id, r.query, b.codec, b.data FROM analysis_results r "
+                "JOIN analysis_blobs b ON b.hash = r.analysis_hash "
+                f"WHERE r.id > :last_id AND r.id NOT IN (SELECT rowid FROM {SEARCH_TABLE}) "
+                "ORDER BY r.id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": batch_size},
+        ).fetchall()
+        if not rows:
+            return 0, last_id
+
+        conn.execute(
+            text(f"INSERT INTO {SEARCH_TABLE} (rowid, query, analysis) VALUES (:id, :query, :analysis)"),
+            [{"id": row_id, "query": query, "analysis": decompress(data, codec)}
+             for row_id, query, codec, data in rows],
+        )
+    return len(rows), rows[-1][0]
+
+
+## Kept in sync with every insert and delete, whichever code path makes them
+@event.listens_for(AnalysisResult, "after_insert")
+def _index_result(mapper, connection, target):
+    if _available:
+        connection.execute(
+            text(f"INSERT INTO {SEARCH_TABLE} (rowid, query, analysis) VALUES (:id, :query, :analysis)"),
+            {"id": target.id, "query": target.query, "analysis": target.analysis or ""},
+        )
+
+
+## A contentless table doesn't keep the text, so a row is deleted by
+## replaying the values it was indexed with
+@event.listens_for(AnalysisResult, "after_delete")
+def _unindex_result(mapper, connection, target):
+    if _available:
+        blob = connection.execute(
+            text("SELECT codec, data FROM analysis_blobs WHERE hash = :hash"), {"hash": target.analysis_hash}
+        ).first()
+        connection.execute(
+            text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, query, analysis) "
+                 "VALUES ('delete', :id, :query, :analysis)"),
+            {"id": target.id, "query": target.query, "analysis": decompress(blob.data, blob.codec) if blob else ""},
+        )
+
+
+# ── Search ───────────────────────────────────────────────────────────────────
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def match_expression(q: str) -> str:
+    """
+    Turns free text into an FTS5 query: every word must match (trailing *
+    for a prefix) and "quoted text" matches as a phrase. Everything is quoted,
+    so punctuation such as going-concern can't be read as FTS5 syntax.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(q):
+        if phrase.strip():
+            terms.append('"' + phrase.replace('"', '""') + '"')
+        elif word:
+            prefix = word.endswith("*")
+            word = word.rstrip("*")
+            if word:
+                terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms) or None
+
+
+def search_results(db, expression: str, limit: int, offset: int = 0) -> list:
+    """Best matches first (bm25), with the query highlighted and a snippet of the analysis."""
+    rows = db.execute(
+        text(
+            "SELECT r.id, r.filename, r.model, r.created_at, r.query, b.codec, b.data, "
+            f"bm25({SEARCH_TABLE}, :query_weight, :analysis_weight) AS score "
+            f"FROM {SEARCH_TABLE} JOIN analysis_results r ON r.id = {SEARCH_TABLE}.rowid "
+            "JOIN analysis_blobs b ON b.hash = r.analysis_hash "
+            f"WHERE {SEARCH_TABLE} MATCH :expression "
+            "ORDER BY score LIMIT :limit OFFSET :offset"
+        ).columns(created_at=DateTime),
+        {
+            "expression": expression,
+            "query_weight": QUERY_WEIGHT,
+            "analysis_weight": ANALYSIS_WEIGHT,
+            "limit": limit,
+            "offset": offset,
+        },
+    ).fetchall()
+
+    terms = term_pattern(expression)
+
+    ## bm25() is lower-is-better; report it so that higher is better
+    return [
+        {"id": row_id, "filename": filename, "model": model, "created_at": created_at,
+         "query": highlight(query, terms), "snippet": snippet(decompress(data, codec), terms),
+         "score": round(-score, 4)}
+        for row_id, filename, model, created_at, query, codec, data, score in rows
+    ]
+
+
+# ── Snippets ─────────────────────────────────────────────────────────────────
+## The index has no text to cut snippets from, so they are built here from the
+## decompressed analysis. Terms are matched on a rough stem, close to what the
+## porter tokenizer matched: "liabilities" marks "liability" too.
+
+_EXPRESSION_TERM = re.compile(r'"((?:[^"]|"")*)"(\*?)')
+_SUFFIXES = ("ations", "ation", "ities", "ity", "ies", "ing", "ed", "es", "s")
+_WORD = re.compile(r"\w+")
+
+
+def _stem(word: str) -> str:
+    word = word.lower()
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def term_pattern(expression: str):
+    """One regex matching every word or phrase of a match_expression() query."""
+    alternatives = []
+    for quoted, prefix in _EXPRESSION_TERM.findall(expression):
+        words = _WORD.findall(quoted.replace('""', '"'))
+        if not words:
+            continue
+        stems = [word.lower() if prefix and i == len(words) - 1 else _stem(word) for i, word in enumerate(words)]
+        alternatives.append(r"\W+".join(rf"\b{re.escape(stem)}\w*" for stem in stems))
+    return re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+
+
+def highlight(value: str, terms) -> str:
+    """HTML-escape `value` and wrap each match in the highlight markers."""
+    if not value:
+        return value
+    if terms is None:
+        return html.escape(value)
+    parts, last = [], 0
+    for match in terms.finditer(value):
+        parts.append(html.escape(value[last:match.start()]))
+        parts.append(HIGHLIGHT_OPEN + html.escape(match.group(0)) + HIGHLIGHT_CLOSE)
+        last = match.end()
+    parts.append(html.escape(value[last:]))
+    return "".join(parts)
+
+
+def snippet(body: str, terms, tokens: int = SEARCH_SNIPPET_TOKENS) -> str:
+    """About `tokens` words around the first match, with matches highlighted."""
+    words = list(re.finditer(r"\S+", body or ""))
+    if not words:
+        return ""
+
+    match = terms.search(body) if terms is not None else None
+    start = 0
+    if match is not None:
+        first = next(i for i, word in enumerate(words) if word.end() > match.start())
+        start = max(0, min(first - tokens // 4, len(words) - tokens))
+    end = min(len(words), start + tokens)
+
+    excerpt = " ".join(word.group(0) for word in words[start:end])
+    return ("…" if start > 0 else "") + highlight(excerpt, terms) + ("…" if end < len(words) else "")
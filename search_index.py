@@ -0,0 +1,198 @@
+import json
+import os
+import re
+import threading
+import uuid
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+## Passages reuse the section-aware splitter, just with a much smaller budget
+from chunking import chunk_document
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+PASSAGE_MAX_TOKENS = int(os.getenv("PASSAGE_MAX_TOKENS", "400"))
+
+INDEX_FILE = "bm25.npz"
+PASSAGES_FILE = "passages.json"
+
+## Standard Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+## Bump when tokenization or the on-disk layout changes
+INDEX_VERSION = 1
+
+INDEX_MEMO_SIZE = 32
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "their this to was were which will with".split()
+)
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+# ── BM25 Index ───────────────────────────────────────────────────────────────
+
+class SearchIndex:
+    """
+    Okapi BM25 over the passages of one document. Postings are stored
+    term-major (CSC-style) in flat NumPy arrays, so scoring a query is a
+    handful of vectorized operations per query term.
+    """
+
+    def __init__(self, passages: list, vocabulary: dict, term_offsets, doc_ids, term_freqs, doc_lengths):
+        self.passages = passages
+        self.vocabulary = vocabulary
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+
+        document_frequency = np.diff(term_offsets).astype(np.float64)
+        count = len(passages)
+        self.idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        self.average_length = float(doc_lengths.mean()) if count else 0.0
+
+    @classmethod
+    def build(cls, chunks):
+        passages, vocabulary = [], {}
+        term_ids, doc_ids, term_freqs, doc_lengths = [], [], [], []
+
+        for doc_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk.text)
+            passages.append({
+                "section": chunk.section,
+                "start_page": chunk.start_page,
+                "end_page": chunk.end_page,
+                "text": chunk.text,
+            })
+            doc_lengths.append(len(tokens))
+
+            for term, freq in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(freq)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=term_offsets[1:])
+
+        return cls(
+            passages,
+            vocabulary,
+            term_offsets,
+            np.asarray(doc_ids, dtype=np.int32)[order],
+            np.asarray(term_freqs, dtype=np.float32)[order],
+            np.asarray(doc_lengths, dtype=np.float32),
+        )
+
+    def search(self, query: str, top_k: int = 5) -> list:
+        """Returns up to top_k (score, passage) pairs, best first."""
+        if not self.passages:
+            return []
+
+        scores = np.zeros(len(self.passages), dtype=np.float64)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / max(self.average_length, 1.0))
+
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            freqs = self.term_freqs[start:end]
+            scores[docs] += self.idf[term_id] * freqs * (BM25_K1 + 1) / (freqs + norm[docs])
+
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+
+        return [(float(scores[i]), self.passages[i]) for i in ranked if scores[i] > 0]
+
+    def save(self, directory: str):
+        ## Each file is written under a temporary name and renamed into place,
+        ## passages last, so load() never sees a partial or mismatched pair
+        ## (concurrent builders of the same document write identical files)
+        suffix = f".{uuid.uuid4().hex}.tmp"
+        index_path = os.path.join(directory, INDEX_FILE)
+        passages_path = os.path.join(directory, PASSAGES_FILE)
+
+        with open(index_path + suffix, "wb") as f:
+            np.savez(
+                f,
+                term_offsets=self.term_offsets,
+                doc_ids=self.doc_ids,
+                term_freqs=self.term_freqs,
+                doc_lengths=self.doc_lengths,
+            )
+        os.replace(index_path + suffix, index_path)
+
+        with open(passages_path + suffix, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "passages": self.passages,
+                "vocabulary": self.vocabulary,
+            }, f)
+        os.replace(passages_path + suffix, passages_path)
+
+    @classmethod
+    def load(cls, directory: str):
+        passages_path = os.path.join(directory, PASSAGES_FILE)
+        index_path = os.path.join(directory, INDEX_FILE)
+        if not (os.path.exists(passages_path) and os.path.exists(index_path)):
+            return None
+
+        with open(passages_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            return None
+
+        with np.load(index_path) as arrays:
+            return cls(
+                meta["passages"],
+                meta["vocabulary"],
+                arrays["term_offsets"],
+                arrays["doc_ids"],
+                arrays["term_freqs"],
+                arrays["doc_lengths"],
+            )
+
+
+# ── Index Store ──────────────────────────────────────────────────────────────
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_search_index(document) -> SearchIndex:
+    """
+    Returns the BM25 index for an ExtractedDocument, building and persisting
+    it next to the parsed text the first time the document is seen.
+    """
+    with _lock:
+        index = _indexes.get(document.content_hash)
+        if index is not None:
+            _indexes.move_to_end(document.content_hash)
+            return index
+
+    index = SearchIndex.load(document.directory)
+    if index is None:
+        index = SearchIndex.build(chunk_document(document.pages(), max_tokens=PASSAGE_MAX_TOKENS))
+        index.save(document.directory)
+
+    with _lock:
+        _indexes[document.content_hash] = index
+        while len(_indexes) > INDEX_MEMO_SIZE:
+            _indexes.popitem(last=False)
+
+    return index
@@ -1,14 +1,15 @@
-## Standard library and environment configuration
-from crewai import Task
+## Tasks are built lazily through the registry, like the agents they are
+## assigned to; crewai and the tools are imported inside the factories below.
+## FIX: All four specialist agents are registered by agents.py, so importing
+## it makes 'investment_advisor' and 'risk_assessor' available to their tasks.
+import agents  # noqa: F401  (registers the agent factories)
+from registry import registry
 
-## FIX: Imported all four specialist agents instead of just two.
-## Previously only 'financial_analyst' and 'verifier' were imported,
-## meaning 'investment_advisor' and 'risk_assessor' were unavailable
-## when their respective tasks tried to reference them below.
-from agents import financial_analyst, verifier, investment_advisor, risk_assessor
 
-## Bringing in the search utility and the custom PDF reader built in tools.py
-from tools import FinancialDocumentTool
+## ── Prompt Version ──────────────────────────────────────────────────────────
+## Bump whenever a task description or expected_output below changes, so
+## cached analyses produced by the old prompts are no longer served.
+PROMPT_VERSION = "5"
 
 
 ## ── Primary Financial Analysis Task ─────────────────────────────────────────
@@ -27,33 +28,43 @@ from tools import FinancialDocumentTool
 ##         with a proper BaseTool instance 'FinancialDocumentTool()'.
 ##         CrewAI requires instantiated tool objects, not bare method pointers.
 
-financial_analysis_task = Task(
-    description=(
-        "Thoroughly examine the uploaded financial document to address "
-        "the user's query: {query}.\n"
-        "Extract key financial metrics such as revenue, net income, operating "
-        "expenses, and cash flow figures directly from the report.\n"
-        "Identify any material risks or opportunities explicitly stated in the document.\n"
-        "Support every finding with a specific reference to the relevant section "
-        "or figure in the source file — do not introduce data from outside the document."
-    ),
-
-    expected_output=(
-        "A well-structured financial analysis report containing:\n"
-        "- A concise executive summary answering the user's query\n"
-        "- Key financial metrics drawn directly from the document\n"
-        "- Identified strengths and areas of concern supported by cited figures\n"
-        "- A short list of material risks noted in the filing\n"
-        "- All findings presented clearly without contradictions or fabricated data"
-    ),
-
-    ## Correctly assigned to the primary analyst agent
-    agent=financial_analyst,
-
-    ## FIX: Instantiated FinancialDocumentTool as a BaseTool object
-    tools=[FinancialDocumentTool()],
-    async_execution=False,
-)
+def _build_financial_analysis_task():
+    from crewai import Task
+    from tools import FinancialDocumentSearchTool, FinancialDocumentTool
+
+    return Task(
+        description=(
+            "Thoroughly examine the uploaded financial document to address "
+            "the user's query: {query}.\n"
+            "The document is located at: {file_path}\n"
+            "Search the document for passages relevant to the query rather than "
+            "reading it in full, and only read whole page ranges when necessary.\n"
+            "Extract key financial metrics such as revenue, net income, operating "
+            "expenses, and cash flow figures directly from the report.\n"
+            "Identify any material risks or opportunities explicitly stated in the document.\n"
+            "Support every finding with a specific reference to the relevant section "
+            "or figure in the source file — do not introduce data from outside the document."
+        ),
+
+        expected_output=(
+            "A well-structured financial analysis report containing:\n"
+            "- A concise executive summary answering the user's query\n"
+            "- Key financial metrics drawn directly from the document\n"
+            "- Identified strengths and areas of concern supported by cited figures\n"
+            "- A short list of material risks noted in the filing\n"
+            "- All findings presented clearly without contradictions or fabricated data"
+        ),
+
+        ## Correctly assigned to the primary analyst agent
+        agent=registry.get("financial_analyst"),
+
+        ## FIX: Instantiated FinancialDocumentTool as a BaseTool object
+        tools=[FinancialDocumentSearchTool(), FinancialDocumentTool()],
+        async_execution=False,
+    )
+
+
+registry.register("financial_analysis_task", _build_financial_analysis_task)
 
 
 ## ── Investment Analysis Task ─────────────────────────────────────────────────
@@ -67,34 +78,45 @@ financial_analysis_task = Task(
 ##
 ## FIX 3: Replaced unbound method with a proper BaseTool instance.
 
-investment_analysis = Task(
-    description=(
-        "Using the verified financial document data, generate investment guidance "
-        "relevant to the user's query: {query}.\n"
-        "Assess the company's financial health by reviewing profitability ratios, "
-        "debt levels, and cash flow trends as reported in the document.\n"
-        "Recommend appropriate investment considerations that are proportionate to "
-        "the risk profile evident in the filing.\n"
-        "All recommendations must be grounded in the document's actual figures "
-        "and compliant with standard fiduciary principles."
-    ),
-
-    expected_output=(
-        "A clear investment guidance report containing:\n"
-        "- An assessment of the company's financial position based on document data\n"
-        "- Specific investment considerations tied to verified financial metrics\n"
-        "- Risk-adjusted recommendations with supporting rationale\n"
-        "- Disclosure of any limitations based on available data\n"
-        "- No fabricated figures, fake URLs, or unverified third-party claims"
-    ),
-
-    ## FIX: Correctly routed to the investment_advisor specialist agent
-    agent=investment_advisor,
-
-    ## FIX: Instantiated FinancialDocumentTool as a BaseTool object
-    tools=[FinancialDocumentTool()],
-    async_execution=False,
-)
+def _build_investment_analysis():
+    from crewai import Task
+    from tools import InvestmentTool, FinancialDocumentSearchTool, FinancialDocumentTool
+
+    return Task(
+        description=(
+            "Using the verified financial document data, generate investment guidance "
+            "relevant to the user's query: {query}.\n"
+            "The document is located at: {file_path}\n"
+            "Search the document for passages relevant to the query rather than "
+            "reading it in full, and only read whole page ranges when necessary.\n"
+            "Use the Investment Analyzer for ratios computed from the reported figures.\n"
+            "Assess the company's financial health by reviewing profitability ratios, "
+            "debt levels, and cash flow trends as reported in the document.\n"
+            "Recommend appropriate investment considerations that are proportionate to "
+            "the risk profile evident in the filing.\n"
+            "All recommendations must be grounded in the document's actual figures "
+            "and compliant with standard fiduciary principles."
+        ),
+
+        expected_output=(
+            "A clear investment guidance report containing:\n"
+            "- An assessment of the company's financial position based on document data\n"
+            "- Specific investment considerations tied to verified financial metrics\n"
+            "- Risk-adjusted recommendations with supporting rationale\n"
+            "- Disclosure of any limitations based on available data\n"
+            "- No fabricated figures, fake URLs, or unverified third-party claims"
+        ),
+
+        ## FIX: Correctly routed to the investment_advisor specialist agent
+        agent=registry.get("investment_advisor"),
+
+        ## FIX: Instantiated FinancialDocumentTool as a BaseTool object
+        tools=[InvestmentTool(), FinancialDocumentSearchTool(), FinancialDocumentTool()],
+        async_execution=False,
+    )
+
+
+registry.register("investment_analysis", _build_investment_analysis)
 
 
 ## ── Risk Assessment Task ─────────────────────────────────────────────────────
@@ -107,34 +129,45 @@ investment_analysis = Task(
 ##
 ## FIX 3: Replaced unbound method with a proper BaseTool instance.
 
-risk_assessment = Task(
-    description=(
-        "Conduct a structured risk assessment based on the financial document "
-        "in response to the user's query: {query}.\n"
-        "Identify material risk factors explicitly disclosed in the filing, "
-        "including liquidity risk, market exposure, debt obligations, and "
-        "any forward-looking uncertainty statements.\n"
-        "Apply established risk frameworks to quantify and prioritise each "
-        "identified risk in proportion to what the document actually shows.\n"
-        "Do not introduce risk scenarios that are unsupported by the source data."
-    ),
-
-    expected_output=(
-        "A calibrated risk assessment report containing:\n"
-        "- A prioritised list of risk factors sourced directly from the document\n"
-        "- A brief explanation of each risk and its potential financial impact\n"
-        "- Suggested mitigation strategies appropriate to the identified risks\n"
-        "- An overall risk rating with clear justification\n"
-        "- No fabricated risk models, invented institutions, or unrealistic timelines"
-    ),
-
-    ## FIX: Correctly routed to the risk_assessor specialist agent
-    agent=risk_assessor,
-
-    ## FIX: Instantiated FinancialDocumentTool as a BaseTool object
-    tools=[FinancialDocumentTool()],
-    async_execution=False,
-)
+def _build_risk_assessment():
+    from crewai import Task
+    from tools import RiskTool, FinancialDocumentSearchTool, FinancialDocumentTool
+
+    return Task(
+        description=(
+            "Conduct a structured risk assessment based on the financial document "
+            "in response to the user's query: {query}.\n"
+            "The document is located at: {file_path}\n"
+            "Search the document for passages relevant to the query rather than "
+            "reading it in full, and only read whole page ranges when necessary.\n"
+            "Use the Risk Assessor for leverage and liquidity ratios computed from the reported figures.\n"
+            "Identify material risk factors explicitly disclosed in the filing, "
+            "including liquidity risk, market exposure, debt obligations, and "
+            "any forward-looking uncertainty statements.\n"
+            "Apply established risk frameworks to quantify and prioritise each "
+            "identified risk in proportion to what the document actually shows.\n"
+            "Do not introduce risk scenarios that are unsupported by the source data."
+        ),
+
+        expected_output=(
+            "A calibrated risk assessment report containing:\n"
+            "- A prioritised list of risk factors sourced directly from the document\n"
+            "- A brief explanation of each risk and its potential financial impact\n"
+            "- Suggested mitigation strategies appropriate to the identified risks\n"
+            "- An overall risk rating with clear justification\n"
+            "- No fabricated risk models, invented institutions, or unrealistic timelines"
+        ),
+
+        ## FIX: Correctly routed to the risk_assessor specialist agent
+        agent=registry.get("risk_assessor"),
+
+        ## FIX: Instantiated FinancialDocumentTool as a BaseTool object
+        tools=[RiskTool(), FinancialDocumentSearchTool(), FinancialDocumentTool()],
+        async_execution=False,
+    )
+
+
+registry.register("risk_assessment", _build_risk_assessment)
 
 
 ## ── Document Verification Task ───────────────────────────────────────────────
@@ -147,32 +180,149 @@ risk_assessment = Task(
 ##
 ## FIX 3: Replaced unbound method with a proper BaseTool instance.
 
-verification = Task(
-    description=(
-        "Inspect the uploaded file to confirm it is a legitimate financial document "
-        "before it proceeds to the analysis pipeline.\n"
-        "Check for the presence of standard financial report components such as "
-        "income statement data, balance sheet entries, cash flow figures, or "
-        "official regulatory disclosures.\n"
-        "If the document does not contain recognisable financial content, "
-        "flag it clearly and halt further processing with a descriptive reason.\n"
-        "Base the verification decision solely on what is present in the file — "
-        "do not assume or infer financial content that is not there."
-    ),
-
-    expected_output=(
-        "A verification summary containing:\n"
-        "- A clear pass or fail verdict on whether the file is a financial document\n"
-        "- The specific financial components identified that support the verdict\n"
-        "- The document type inferred (e.g. annual report, earnings release, 10-K)\n"
-        "- Any anomalies or missing sections noted during review\n"
-        "- A concise confidence statement based strictly on observed document content"
-    ),
-
-    ## FIX: Correctly routed to the verifier specialist agent
-    agent=verifier,
-
-    ## FIX: Instantiated FinancialDocumentTool as a BaseTool object
-    tools=[FinancialDocumentTool()],
-    async_execution=False,
-)
\ No newline at end of file
+def _build_verification():
+    from crewai import Task
+    from tools import FinancialDocumentTool
+
+    return Task(
+        description=(
+            "Inspect the uploaded file to confirm it is a legitimate financial document "
+            "before it proceeds to the analysis pipeline.\n"
+            "The document is located at: {file_path}\n"
+            "Check for the presence of standard financial report components such as "
+            "income statement data, balance sheet entries, cash flow figures, or "
+            "official regulatory disclosures.\n"
+            "If the document does not contain recognisable financial content, "
+            "flag it clearly and halt further processing with a descriptive reason.\n"
+            "Base the verification decision solely on what is present in the file — "
+            "do not assume or infer financial content that is not there."
+        ),
+
+        expected_output=(
+            "A verification summary containing:\n"
+            "- A first line reading exactly 'VERDICT: PASS' or 'VERDICT: FAIL'\n"
+            "- A clear pass or fail verdict on whether the file is a financial document\n"
+            "- The specific financial components identified that support the verdict\n"
+            "- The document type inferred (e.g. annual report, earnings release, 10-K)\n"
+            "- Any anomalies or missing sections noted during review\n"
+            "- A concise confidence statement based strictly on observed document content"
+        ),
+
+        ## FIX: Correctly routed to the verifier specialist agent
+        agent=registry.get("verifier"),
+
+        ## FIX: Instantiated FinancialDocumentTool as a BaseTool object
+        tools=[FinancialDocumentTool()],
+        async_execution=False,
+    )
+
+
+registry.register("verification", _build_verification)
+
+
+## ── Chunk Analysis Task (map step) ──────────────────────────────────────────
+## Used by the map-reduce mode: each section-aware chunk of a large filing is
+## analysed independently, so the prompt never exceeds one chunk of text.
+
+def _build_chunk_analysis_task():
+    from crewai import Task
+
+    return Task(
+        description=(
+            "Analyze the following excerpt of a financial filing in light of "
+            "the user's query: {query}.\n"
+            "Section: {section} (pages {pages})\n"
+            "Extract the key figures, trends, and risks stated in this excerpt only. "
+            "If the excerpt contains nothing relevant, say so in one sentence.\n\n"
+            "--- EXCERPT START ---\n{chunk_text}\n--- EXCERPT END ---"
+        ),
+
+        expected_output=(
+            "A concise bullet list of findings from this excerpt, each with the "
+            "exact figure or statement it is based on and the section it came from."
+        ),
+
+        agent=registry.get("excerpt_analyst"),
+        async_execution=False,
+    )
+
+
+registry.register("chunk_analysis_task", _build_chunk_analysis_task)
+
+
+## ── Report Synthesis Task (reduce step) ─────────────────────────────────────
+## Merges the per-chunk findings into the final report. Large documents may
+## need several rounds of this task, each over a bounded batch of findings.
+
+def _build_report_synthesis_task():
+    from crewai import Task
+
+    return Task(
+        description=(
+            "Combine the following section-by-section findings from a single financial "
+            "filing into one report that answers the user's query: {query}.\n"
+            "Remove duplicates, reconcile overlapping figures, and keep the section "
+            "references. Do not add information that is not in the findings.\n\n"
+            "--- FINDINGS START ---\n{findings}\n--- FINDINGS END ---"
+        ),
+
+        expected_output=(
+            "A well-structured financial analysis report containing:\n"
+            "- A concise executive summary answering the user's query\n"
+            "- Key financial metrics with their source sections\n"
+            "- Identified strengths and areas of concern\n"
+            "- A short list of material risks noted in the filing"
+        ),
+
+        agent=registry.get("excerpt_analyst"),
+        async_execution=False,
+    )
+
+
+registry.register("report_synthesis_task", _build_report_synthesis_task)
+
+
+## ── Delta Analysis Task (incremental mode) ──────────────────────────────────
+## Updates the issuer's previous report with only the passages of the new
+## filing that changed, instead of analysing the whole document again.
+
+def _build_delta_analysis_task():
+    from crewai import Task
+
+    return Task(
+        description=(
+            "Below is an earlier analysis of this issuer's previous filing, followed by the "
+            "passages of the new filing that are new or changed since then. Produce the "
+            "analysis of the new filing that answers the user's query: {query}.\n"
+            "Keep the parts of the earlier analysis the changes do not affect. Update every "
+            "figure, trend and risk the changes touch, and say what changed compared with the "
+            "earlier filing. Treat these sections as no longer present: {removed_sections}.\n"
+            "Do not add information that is in neither the earlier analysis nor the changes.\n\n"
+            "--- EARLIER ANALYSIS START ---\n{prior_analysis}\n--- EARLIER ANALYSIS END ---\n\n"
+            "--- CHANGES START ---\n{changes}\n--- CHANGES END ---"
+        ),
+
+        expected_output=(
+            "A well-structured financial analysis report of the new filing containing:\n"
+            "- A concise executive summary answering the user's query\n"
+            "- Key financial metrics, updated where the filing changed them\n"
+            "- A short 'Changes since the previous filing' section citing the changed sections\n"
+            "- Identified strengths, areas of concern and material risks"
+        ),
+
+        agent=registry.get("excerpt_analyst"),
+        async_execution=False,
+    )
+
+
+registry.register("delta_analysis_task", _build_delta_analysis_task)
+
+
+## ── Lazy Module Attributes ──────────────────────────────────────────────────
+## Keeps `from task import financial_analysis_task` working: the task (and
+## its agent) is built through the registry the first time it is accessed.
+
+def __getattr__(name):
+    if registry.has(name):
+        return registry.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
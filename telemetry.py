@@ -0,0 +1,248 @@
+import bisect
+import cProfile
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+## OpenTelemetry is optional: without it spans only feed the /metrics histograms
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "financial-document-analyzer")
+
+## Spans are exported over OTLP/HTTP when an endpoint is configured
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+## Per-request cProfile dumps (requested with an X-Profile header) are only
+## written when this directory is set, so clients cannot turn profiling on
+PROFILE_DIR = os.getenv("PROFILE_DIR") or None
+
+## Seconds; covers everything from a tool call to a multi-minute crew
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_tracer = trace.get_tracer(SERVICE_NAME) if trace is not None else None
+
+
+# ── Metric Types ─────────────────────────────────────────────────────────────
+## Minimal Prometheus text-format metrics; each keeps one series per label set.
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, list(zip(self.labels, key)), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                labels = list(zip(self.labels, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", labels + [("le", _format(float(bound)))], cumulative))
+                samples.append((f"{self.name}_bucket", labels + [("le", "+Inf")], count))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Gauge:
+    """Read at scrape time from a callback returning {label values tuple: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.callback = callback
+
+    def samples(self):
+        return [(self.name, list(zip(self.labels, key)), value) for key, value in self.callback().items()]
+
+
+def _format(value) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# ── Registry ─────────────────────────────────────────────────────────────────
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception:
+                logger.exception("Collecting %s failed", metric.name)
+                continue
+
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, pairs, value in samples:
+                labels = ",".join(f'{label}="{_escape(str(v))}"' for label, v in pairs)
+                lines.append(f"{name}{{{labels}}} {_format(value)}" if labels else f"{name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_duration = metrics.register(Histogram(
+    "analyzer_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",)
+))
+http_request_duration = metrics.register(Histogram(
+    "analyzer_http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+))
+llm_tokens = metrics.register(Counter(
+    "analyzer_llm_tokens_total", "LLM tokens used, by agent and token type.", ("agent", "type")
+))
+classifier_decisions = metrics.register(Counter(
+    "analyzer_classifier_decisions_total", "Local pre-verification decisions, by document type.",
+    ("decision", "document_type")
+))
+
+
+# ── Spans ────────────────────────────────────────────────────────────────────
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Times one pipeline stage: always recorded in the stage histogram, and
+    exported as an OpenTelemetry span (nested under the current one) when
+    tracing is configured.
+    """
+    otel_span = nullcontext() if _tracer is None else _tracer.start_as_current_span(
+        stage, attributes={key: str(value) for key, value in attributes.items()}
+    )
+
+    start = time.perf_counter()
+    with otel_span:
+        try:
+            yield
+        finally:
+            stage_duration.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_tokens(agent: str, crew_output):
+    usage = getattr(crew_output, "token_usage", None)
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, kind, 0) or 0
+        if count:
+            llm_tokens.inc(count, agent=agent, type=kind.split("_")[0])
+
+
+# ── Profiling ────────────────────────────────────────────────────────────────
+
+@contextmanager
+def profiled(enabled: bool, name: str = None):
+    """
+    Writes a cProfile dump of the enclosed block to PROFILE_DIR (inspect with
+    `python -m pstats` or snakeviz). cProfile sees the calling thread only, so
+    work fanned out to pipeline threads appears as time spent waiting on them.
+    """
+    if not (enabled and PROFILE_DIR):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = name or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(PROFILE_DIR, f"{name}.prof")
+        profiler.dump_stats(path)
+        logger.info("Wrote profile to %s", path)
+
+
+# ── Setup ────────────────────────────────────────────────────────────────────
+
+def setup_tracing(app):
+    """Exports spans over OTLP and instruments FastAPI, when the SDK is installed."""
+    if trace is None:
+        return
+
+    if OTEL_EXPORTER_OTLP_ENDPOINT:
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but the OpenTelemetry SDK is not installed")
+        else:
+            provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+
+    try:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    except ImportError:
+        return
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics")
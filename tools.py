@@ -3,8 +3,17 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-## Third-party PDF loader
-from langchain_community.document_loaders import PyPDFLoader
+## Shared per-document extraction store (parses each PDF once)
+from docstore import document_store
+
+## Offline BM25 relevance index built over the stored page text
+from search_index import get_search_index
+
+## Deterministic statement extraction and ratio engine
+from financials import get_financial_metrics
+
+## Per-stage timing spans (metrics and optional OpenTelemetry)
+from telemetry import span
 
 ## CrewAI base tool class
 from crewai.tools import BaseTool   
@@ -16,54 +25,164 @@ from pydantic import Field
 
 class FinancialDocumentTool(BaseTool):
     name: str = "Financial Document Reader"
-    description: str = "Reads and extracts text from a PDF financial document."
+    description: str = (
+        "Reads and extracts text from a PDF financial document. "
+        "Optionally pass start_page and end_page (1-based, inclusive) "
+        "to read only a range of pages instead of the full report."
+    )
 
-    def _run(self, path: str = 'data/sample.pdf'):
+    def _run(self, path: str = 'data/sample.pdf', start_page: int = None, end_page: int = None):
+        """
+        Returns the cleaned text of the requested pages (the full report by
+        default). The PDF is parsed once per file content and then served
+        from the shared document store.
+        """
+
+        with span("tool:read_document"):
+            document = document_store.load(path)
+
+            return document.text(start_page, end_page)
+
+
+# ── Financial Document Search ────────────────────────────────────────────────
+
+class FinancialDocumentSearchTool(BaseTool):
+    name: str = "Search Financial Document"
+    description: str = (
+        "Searches a PDF financial document and returns only the passages most "
+        "relevant to a search query, with their section and page numbers. "
+        "Prefer this over reading the full document."
+    )
+
+    def _run(self, query: str, path: str = 'data/sample.pdf', top_k: int = 5):
         """
-        Loads a PDF file page by page and returns the cleaned full text.
+        Ranks the document's section-aware passages with BM25 and returns the
+        top_k best matches. Runs fully offline against the local index.
         """
 
-        # Load PDF pages properly into a variable
-        docs = PyPDFLoader(path).load()
+        with span("tool:search"):
+            document = document_store.load(path)
+            hits = get_search_index(document).search(query, top_k)
+
+        if not hits:
+            return "No passages in the document matched the query."
+
+        return "\n\n".join(
+            f"[{passage['section']}, pages {passage['start_page']}-{passage['end_page']}]\n{passage['text']}"
+            for _, passage in hits
+        )
 
-        full_report = ""
-        for data in docs:
-            content = data.page_content
 
-            # Remove excessive blank lines
-            while "\n\n" in content:
-                content = content.replace("\n\n", "\n")
+# ── Metric Formatting ────────────────────────────────────────────────────────
 
-            full_report += content + "\n"
+PERCENT_METRICS = {
+    "gross_margin", "operating_margin", "net_margin", "fcf_margin",
+    "return_on_assets", "return_on_equity", "liabilities_to_assets",
+}
 
-        return full_report
+
+def _format_value(name: str, value) -> str:
+    if value is None or value != value:
+        return "n/a"
+    if name in PERCENT_METRICS:
+        return f"{value:.1%}"
+    if abs(value) >= 1000:
+        return f"{value:,.0f}"
+    return f"{value:.2f}"
+
+
+def _format_metrics(metrics, names: list, title: str) -> str:
+    periods = [str(p) for p in metrics.ratios.columns]
+    lines = [f"{title} (periods: {', '.join(periods)}; amounts in {metrics.scale})"]
+
+    for name in names:
+        table = metrics.ratios if name in metrics.ratios.index else metrics.line_items
+        changes = metrics.ratio_changes if table is metrics.ratios else metrics.line_item_changes
+        if name not in table.index:
+            continue
+
+        values = " | ".join(_format_value(name, v) for v in table.loc[name])
+        change = changes.get(name)
+        trend = "" if change is None or change != change else f" (YoY {change:+.1%})"
+        lines.append(f"- {name.replace('_', ' ')}: {values}{trend}")
+
+    return "\n".join(lines)
 
 
 # ── Investment Analysis Tool ─────────────────────────────────────────────────
 
 class InvestmentTool(BaseTool):
     name: str = "Investment Analyzer"
-    description: str = "Analyzes financial document data for investment insights."
-
-    def _run(self, financial_document_data: str):
+    description: str = (
+        "Extracts income statement, balance sheet and cash flow figures from a PDF "
+        "financial document and returns profitability, return, cash flow and growth "
+        "metrics computed directly from the reported numbers."
+    )
 
-        processed_data = financial_document_data
+    def _run(self, path: str = 'data/sample.pdf'):
+        """
+        Returns profitability and growth metrics for every reported period.
+        Computed locally and cached per document, so no LLM call is needed.
+        """
 
-        i = 0
-        while i < len(processed_data):
-            if processed_data[i:i+2] == "  ":
-                processed_data = processed_data[:i] + processed_data[i+1:]
-            else:
-                i += 1
+        with span("tool:investment_metrics"):
+            metrics = get_financial_metrics(document_store.load(path))
 
-        return "Investment analysis functionality to be implemented"
+        return _format_metrics(metrics, [
+            "revenue", "gross_profit", "operating_income", "net_income",
+            "gross_margin", "operating_margin", "net_margin",
+            "return_on_assets", "return_on_equity",
+            "operating_cash_flow", "free_cash_flow", "fcf_margin",
+        ], "Investment metrics")
 
 
 # ── Risk Assessment Tool ─────────────────────────────────────────────────────
 
 class RiskTool(BaseTool):
     name: str = "Risk Assessor"
-    description: str = "Performs risk assessment on financial document data."
+    description: str = (
+        "Extracts balance sheet and cash flow figures from a PDF financial document "
+        "and returns leverage, liquidity and coverage ratios with flags for values "
+        "outside common thresholds."
+    )
+
+    def _run(self, path: str = 'data/sample.pdf'):
+        """
+        Returns leverage and liquidity metrics plus rule-based risk flags.
+        Computed locally and cached per document, so no LLM call is needed.
+        """
 
-    def _run(self, financial_document_data: str):
-        return "Risk assessment functionality to be implemented"
\ No newline at end of file
+        with span("tool:risk_metrics"):
+            metrics = get_financial_metrics(document_store.load(path))
+
+        report = _format_metrics(metrics, [
+            "cash", "current_assets", "current_liabilities", "total_liabilities",
+            "long_term_debt", "total_equity",
+            "current_ratio", "cash_ratio", "debt_to_equity",
+            "liabilities_to_equity", "liabilities_to_assets",
+            "interest_coverage", "free_cash_flow",
+        ], "Risk metrics")
+
+        flags = _risk_flags(metrics)
+        if flags:
+            report += "\nFlags:\n" + "\n".join(f"- {flag}" for flag in flags)
+
+        return report
+
+
+def _risk_flags(metrics) -> list:
+    checks = [
+        ("current_ratio", lambda v: v < 1.0, "Current ratio below 1.0 (short-term liquidity pressure)"),
+        ("debt_to_equity", lambda v: v > 2.0, "Long-term debt above 2x equity (high leverage)"),
+        ("total_equity", lambda v: v < 0, "Negative shareholders' equity"),
+        ("interest_coverage", lambda v: v < 3.0, "Operating income covers interest less than 3x"),
+        ("free_cash_flow", lambda v: v < 0, "Negative free cash flow in the latest period"),
+        ("net_income", lambda v: v < 0, "Net loss in the latest period"),
+    ]
+
+    flags = []
+    for name, breached, message in checks:
+        value = metrics.latest(name)
+        if value is not None and breached(value):
+            flags.append(message)
+    return flags
@@ -0,0 +1,71 @@
+import hashlib
+import os
+
+from fastapi import UploadFile
+
+from telemetry import span
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    """Raised as soon as an upload grows past the configured maximum size."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the maximum size of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+# ── Streaming Upload ─────────────────────────────────────────────────────────
+
+async def spool_upload(file: UploadFile, dest: str,
+                       max_bytes: int = MAX_UPLOAD_BYTES,
+                       chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Copies an upload to `dest` in fixed-size chunks, hashing as it goes, so at
+    most one chunk is held in memory regardless of the file size.
+    Returns (size_in_bytes, sha256_hex).
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    with span("upload"), open(dest, "wb") as out:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+
+            digest.update(chunk)
+            out.write(chunk)
+
+    return size, digest.hexdigest()
+
+
+def copy_stream(src, dest: str,
+                max_bytes: int = MAX_UPLOAD_BYTES,
+                chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Blocking counterpart of spool_upload for file-like sources such as
+    archive members. Returns (size_in_bytes, sha256_hex).
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    with span("archive_extract"), open(dest, "wb") as out:
+        for chunk in iter(lambda: src.read(chunk_size), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+
+            digest.update(chunk)
+            out.write(chunk)
+
+    return size, digest.hexdigest()